@@ -0,0 +1,111 @@
+"""課堂尖峰時的流量控制：老師一喊「送出」，幾十個人同時按下確定決策。
+
+- 同一隊的寫入以 team_lock() 排隊：同一個 session 的 rerun 本來就依序執行，
+  要排隊的是同一隊 (網址上同一個 ?team= 代碼) 開在兩個分頁的情況；
+  跨 worker 的同一隊由 state_backend.save_team() 的版本檢查擋下
+- 重複送出 (連點兩下) 以冪等鍵 (表單名稱, 使用者看到的狀態版本) 去重：
+  同一個畫面上的同一張表單只會生效一次；鍵在寫入完成時才記下，寫入失敗
+  (例外、被別的分頁搶先) 時修正後可以再送出
+- 圖表、戰報等較重的繪製以 heavy() 限制同時進行的數量 (COSTGAME_HEAVY_RENDERS，預設 4)；
+  排隊超過 COSTGAME_HEAVY_TIMEOUT 秒 (預設 2) 或排隊人數超過 COSTGAME_HEAVY_QUEUE (預設 32)
+  時改畫精簡版，讓延遲平緩上升，而不是所有人一起卡住
+"""
+import collections
+import contextlib
+import os
+import threading
+import time
+import weakref
+
+import metrics
+
+HEAVY_RENDERS = int(os.environ.get('COSTGAME_HEAVY_RENDERS', '4'))
+HEAVY_QUEUE = int(os.environ.get('COSTGAME_HEAVY_QUEUE', '32'))
+HEAVY_TIMEOUT = float(os.environ.get('COSTGAME_HEAVY_TIMEOUT', '2'))
+DONE_KEYS = 64  # 每個 session 記住最近幾個已處理的冪等鍵
+
+_lock = threading.Lock()
+_team_locks = weakref.WeakValueDictionary()   # 沒有人持有時自動移除，不會隨 session 數增長
+_heavy = threading.BoundedSemaphore(HEAVY_RENDERS)
+_waiting = 0
+_stats = {'duplicates': 0, 'heavy_admitted': 0, 'heavy_fallback': 0, 'heavy_waiting': 0}
+
+
+# --- 1. 每隊寫入排隊 ---
+def team_lock(team):
+    """team 為隊伍代碼；同一隊在同一個 worker 裡的寫入共用一把鎖"""
+    with _lock:
+        lock = _team_locks.get(team)
+        if lock is None:
+            lock = _team_locks[team] = threading.Lock()
+        return lock
+
+
+# --- 2. 冪等鍵 ---
+def new_state():
+    """每個 session 一份：version 每次寫入 +1，shown 是使用者畫面上看到的版本"""
+    return {'version': 0, 'shown': 0, 'done': collections.deque(maxlen=DONE_KEYS)}
+
+
+def claim(state, form):
+    """表單送出時呼叫；同一畫面上同一張表單已生效過就回傳 False"""
+    key = (form, state['shown'])
+    with _lock:
+        if key in state['done']:
+            _stats['duplicates'] += 1
+            return False
+    state['pending'] = key
+    return True
+
+
+def committed(state):
+    """寫入完成：記下這次送出的冪等鍵，狀態版本 +1"""
+    key = state.pop('pending', None)
+    if key is not None:
+        with _lock:
+            state['done'].append(key)
+    state['version'] += 1
+
+
+def reloaded(state):
+    """狀態整個換成別處寫入的版本：這次送出不算數，版本 +1 讓重畫後的表單可以再送出"""
+    state.pop('pending', None)
+    state['version'] += 1
+
+
+def shown(state):
+    """畫面完整送到瀏覽器後呼叫 (rerun 中途被中斷不算)"""
+    state['shown'] = state['version']
+
+
+# --- 3. 重繪製的同時數量上限 ---
+@contextlib.contextmanager
+def heavy(name='render'):
+    """with heavy() as admitted: admitted 為 False 時請畫精簡版"""
+    global _waiting
+    start = time.perf_counter()
+    with _lock:
+        full = _waiting >= HEAVY_QUEUE
+        if not full:
+            _waiting += 1
+    admitted = False
+    if not full:
+        try:
+            admitted = _heavy.acquire(timeout=HEAVY_TIMEOUT)
+        finally:
+            with _lock:
+                _waiting -= 1
+    if metrics.ENABLED:
+        metrics.observe(f'admission.{name}.wait', time.perf_counter() - start)
+    with _lock:
+        _stats['heavy_admitted' if admitted else 'heavy_fallback'] += 1
+    try:
+        yield admitted
+    finally:
+        if admitted:
+            _heavy.release()
+
+
+def stats():
+    with _lock:
+        return dict(_stats, heavy_waiting=_waiting)
@@ -0,0 +1,248 @@
+"""costgame 效能基準測試。
+
+涵蓋：predict_sales 純量 / 批次、損益分析圖、S4 最終戰報 (表格 + 資金圖)、長期經營逐月戰報，
+以及用 Streamlit AppTest 從首頁一路玩到 M3 的完整 rerun。
+
+    python bench.py                             # 跑全部並輸出 bench_output.json
+    python bench.py --only predict              # 只跑名稱含 predict 的項目
+    python bench.py --compare baseline.json     # 與基準比較，退步超過門檻則 exit 1
+    python bench.py --scaling 1,2,4             # 多 worker 吞吐量：每個 worker 一個行程，共用 SQLite 狀態檔
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import engine
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_OUTPUT = 'bench_output.json'
+
+
+# --- 1. 測試資料 ---
+def sample_decisions(n, seed=0):
+    rng = random.Random(seed)
+    styles = list(engine.GAME_CONFIG['styles'])
+    return ([rng.choice(styles) for _ in range(n)],
+            [rng.randint(20, 200) for _ in range(n)],
+            [rng.randrange(0, 50001, 1000) for _ in range(n)])
+
+
+def sample_team(seed=0):
+    """照畫面流程產生一個玩到 M3 的 team dict"""
+    rng = random.Random(seed)
+    cfg = engine.GAME_CONFIG
+    return engine.play_game({'style': rng.choice(list(cfg['styles'])), 'bean': rng.choice(list(cfg['beans'])),
+                             'milk': rng.choice(list(cfg['milks'])), 'choices': ['B', 'B', 'B'], 'seed': seed})
+
+
+# --- 2. 測試項目 (每個回傳一個要重複計時的無參數函式) ---
+def bench_predict_scalar(n=10000):
+    styles, prices, budgets = sample_decisions(n)
+    def run():
+        for s, p, m in zip(styles, prices, budgets):
+            engine.predict_sales(s, p, m)
+    return run, n
+
+
+def bench_predict_batch(n=10000):
+    styles, prices, budgets = sample_decisions(n)
+    def run():
+        engine.predict_sales_batch(styles, prices, budgets)
+    return run, n
+
+
+def bench_breakeven_chart():
+    import charts
+    team = sample_team()
+    return (lambda: charts.build_breakeven_chart(team)), 1
+
+
+def bench_final_report():
+    """經典模式結算畫面：與 render_history 相同，建立 HistoryView 後寫入整個 history"""
+    import charts
+    team = sample_team()
+    def run():
+        view = charts.HistoryView(engine.LAST_MONTH + 1)
+        view.sync(team['history'])
+        view.table()
+    return run, 1
+
+
+def bench_campaign_report(months=36):
+    """長期經營模式：每個月以 HistoryView 增量更新資金圖與戰報"""
+    import charts
+    history = engine.play_game({'style': 'A', 'bean': '普通商用豆', 'milk': '燕麥奶', 'months': months,
+                                'choices': ['B'] * months, 'seed': 0})['history']
+    def run():
+        view = charts.HistoryView(months + 1)
+        for n in range(1, len(history) + 1):
+            view.sync(history[:n])
+            view.table()
+    return run, len(history)
+
+
+def click(at, label):
+    for b in at.button:
+        if b.label == label:
+            b.click().run()
+            return
+    raise RuntimeError(f"找不到按鈕：{label}")
+
+
+def play_through(at, seed=0):
+    """首頁 -> S1 -> S2 -> S3 -> M0 -> M1~M3，每一步都是一次完整 rerun。
+
+    AppTest 在同一個行程執行腳本，先固定全域 random，M3 的賭局每次都走同一條路徑。
+    """
+    random.seed(seed)
+    at.run()
+    at.text_input[0].input('bench').run()
+    click(at, '創立我的咖啡廳！')
+    for label in ['確認/更新打造', '提交/更新預算', '試算建議售價', '確認定價，與 AI 對決！', '接受挑戰，進入生存戰！']:
+        click(at, label)
+    for _ in range(engine.LAST_MONTH):
+        # 表單內的選擇要跟著送出按鈕一起送出，中間不可先 run()，否則選擇會被丟掉
+        at.radio[-1].set_value(at.radio[-1].options[1])
+        click(at, '確定決策')
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+
+def bench_playthrough():
+    from streamlit.testing.v1 import AppTest
+    def run():
+        play_through(AppTest.from_file(str(ROOT / 'costgame.py'), default_timeout=60))
+    return run, 1
+
+
+BENCHMARKS = {
+    'predict_sales.scalar': bench_predict_scalar,
+    'predict_sales.batch': bench_predict_batch,
+    'chart.breakeven': bench_breakeven_chart,
+    'report.final': bench_final_report,
+    'report.campaign': bench_campaign_report,
+    'page.playthrough': bench_playthrough,
+}
+
+
+# --- 3. 多 worker 吞吐量 ---
+def _scaling_worker(duration):
+    """一個 worker 行程：先玩一局暖機，再於 duration 秒內盡量多玩幾局，回傳 (局數, 秒數)"""
+    from streamlit.testing.v1 import AppTest
+    def new_app():
+        return AppTest.from_file(str(ROOT / 'costgame.py'), default_timeout=60)
+    play_through(new_app())
+    games, start = 0, time.perf_counter()
+    while time.perf_counter() - start < duration:
+        play_through(new_app())
+        games += 1
+    return games, time.perf_counter() - start
+
+
+def run_scaling(worker_counts, duration):
+    """模擬 deploy/launch.py 的部署：N 個獨立直譯器同時整局遊玩，狀態寫入同一個 SQLite 檔"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['COSTGAME_STATE_DB'] = str(Path(tmp) / 'state.db')
+        os.environ.setdefault('COSTGAME_RECORD_DIR', str(Path(tmp) / 'records'))
+        ctx = multiprocessing.get_context('spawn')
+        for n in worker_counts:
+            with ctx.Pool(n) as pool:
+                runs = pool.map(_scaling_worker, [duration] * n)
+            throughput = sum(games / elapsed for games, elapsed in runs)
+            results[str(n)] = {'workers': n, 'games': sum(g for g, _ in runs), 'games_per_s': throughput,
+                               'speedup': throughput / results['1']['games_per_s'] if '1' in results else None}
+            speedup = results[str(n)]['speedup']
+            print(f"workers {n:<3} {throughput:8.2f} 局/秒" + (f"   {speedup:.2f}x" if speedup else ''), flush=True)
+    return results
+
+
+# --- 4. 執行與比較 ---
+def measure(factory, repeat, warmup=1):
+    run, items = factory()
+    for _ in range(warmup):
+        run()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return {'items': items, 'repeat': repeat, 'min': min(times), 'median': statistics.median(times),
+            'mean': statistics.fmean(times), 'per_item': statistics.median(times) / items}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_all(names, repeat):
+    results = {}
+    for name in names:
+        reps = max(1, repeat // 5) if name == 'page.playthrough' else repeat
+        results[name] = measure(BENCHMARKS[name], reps)
+        r = results[name]
+        print(f"{name:<24} median {r['median'] * 1000:10.3f} ms   min {r['min'] * 1000:10.3f} ms", flush=True)
+    return {'meta': {'revision': git_revision(), 'python': platform.python_version(),
+                     'machine': platform.node(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'results': results}
+
+
+def compare(current, baseline, threshold):
+    """以中位數比較，慢於基準超過 threshold (比例) 的項目視為退步"""
+    regressions = []
+    for name, r in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:<24} (基準中沒有此項目)")
+            continue
+        ratio = r['median'] / base['median']
+        flag = 'REGRESSION' if ratio > 1 + threshold else ('faster' if ratio < 1 - threshold else 'ok')
+        print(f"{name:<24} {ratio:6.2f}x  {flag}")
+        if flag == 'REGRESSION':
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', help='只執行名稱包含此字串的項目')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--compare', metavar='BASELINE', help='要比較的基準 JSON')
+    parser.add_argument('--threshold', type=float, default=0.10, help='退步門檻 (預設 0.10 = 慢 10%%)')
+    parser.add_argument('--scaling', metavar='N,N,...', help='改跑多 worker 吞吐量，例如 1,2,4')
+    parser.add_argument('--duration', type=float, default=20, help='--scaling 每種 worker 數的量測秒數')
+    args = parser.parse_args(argv)
+
+    if args.scaling:
+        counts = [int(n) for n in args.scaling.split(',')]
+        result = {'meta': {'revision': git_revision(), 'cpus': os.cpu_count(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+                  'scaling': run_scaling(counts, args.duration)}
+        Path(args.output).write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding='utf-8')
+        return 0
+
+    names = [n for n in BENCHMARKS if not args.only or args.only in n]
+    current = run_all(names, args.repeat)
+    Path(args.output).write_text(json.dumps(current, indent=2, ensure_ascii=False), encoding='utf-8')
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        if compare(current, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""AI 銷量模型的參數校正。
+
+要校正的參數：各店型 base_traffic、價格斜率 price_slope、各店型行銷倍數
+marketing_multiplier。其餘 (參考價、低預算門檻與懲罰、上下限) 維持設定值。
+price_slope 各店型共用，只有在每個店型都有資料時才校正，否則維持原值並印出警告。
+
+未觸及上下限時，模型對這 7 個參數是線性的，因此可直接以有界 (>= 0) 最小平方法
+一次解出；觸及上限或保底的觀測值被截斷，不納入擬合。
+
+兩種資料來源：
+    python calibrate.py --observations obs.jsonl      # 每行 {"style","price","mkt","sales"}
+    python calibrate.py --records records/            # 課堂存檔：試營運與 M1 的實際銷量
+    python calibrate.py --target target.json [--corpus decisions.jsonl]
+        # 依目標分布擬合：target.json 為各店型銷量分位數，例如
+        # {"A": {"0.1": 800, "0.5": 2000, "0.9": 3500}, "B": {...}, "C": {...}}
+
+結果 (經 engine.validate_config 驗證) 寫成 JSON 覆寫檔，啟動時以
+COSTGAME_CONFIG_FILE=calibrated_config.json 套用。
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+import engine
+import records
+
+DEFAULT_OUTPUT = 'calibrated_config.json'
+
+
+# --- 1. 讀取觀測值 (皆回傳 styles, prices, budgets, sales 四個陣列) ---
+def _arrays(rows):
+    if not rows:
+        raise ValueError("沒有可用的觀測值")
+    styles, prices, budgets, sales = zip(*rows)
+    return np.array(styles), np.array(prices, dtype=float), np.array(budgets, dtype=float), np.array(sales, dtype=float)
+
+
+def read_observations(path):
+    with open(path, encoding='utf-8') as f:
+        rows = [(o['style'], o['price'], o['mkt'], o['sales']) for o in map(json.loads, filter(str.strip, f))]
+    return _arrays(rows)
+
+
+def observations_from_records(record_dir):
+    rows = []
+    for record in records.load_team_records(record_dir):
+        data = record['data']
+        if 'ai_predicted_sales' not in data:
+            continue
+        style, price, mkt = data['style'], data['final_price'], data['estimated_indirect']['行銷']
+        rows.append((style, price, mkt, data['ai_predicted_sales']))
+        # 通膨事件的銷量也由需求模型決定 (選 B 時售價 +20%)；長期經營模式的事件是抽出來的，
+        # 其他事件的銷量與需求模型無關，不能當作觀測值
+        for month, h in enumerate(data.get('history', [])[1:], start=1):
+            if engine.month_event(data, month) == 1:
+                rows.append((style, int(price * 1.2) if h['Event'].startswith('B') else price, mkt, h['Sales']))
+    return _arrays(rows)
+
+
+# --- 2. 線性化與有界最小平方 ---
+def param_names(config):
+    styles = list(config['styles'])
+    return [f"base_traffic.{s}" for s in styles] + ['price_slope'] + [f"marketing_multiplier.{s}" for s in styles]
+
+
+def current_params(config):
+    demand = config['demand']
+    styles = list(config['styles'])
+    return np.array([config['styles'][s]['base_traffic'] for s in styles] + [demand['price_slope']]
+                    + [demand['marketing_multiplier'][s] for s in styles], dtype=float)
+
+
+def design_matrix(styles, prices, budgets, config):
+    """回傳 (X, offset)：未截斷時 銷量 = X @ params + offset"""
+    demand = config['demand']
+    keys = list(config['styles'])
+    n, k = len(styles), len(keys)
+    X = np.zeros((n, 2 * k + 1))
+    offset = np.zeros(n)
+    root = np.sqrt(budgets)
+    threshold = demand['low_budget_threshold']
+    for i, key in enumerate(keys):
+        is_style = styles == key
+        X[:, i] = is_style
+        penalty = demand['low_budget_penalty'].get(key)
+        low = (budgets < threshold) if penalty else np.zeros(n, dtype=bool)
+        X[:, k + 1 + i] = np.where(is_style & ~low, root, 0.0)
+        if penalty:
+            offset += np.where(is_style & low, -penalty + (budgets / threshold) * penalty, 0.0)
+    X[:, k] = demand['reference_price'] - prices
+    return X, offset
+
+
+def uncensored(budgets, sales, config):
+    demand = config['demand']
+    floor = np.trunc(budgets / demand['budget_per_min_sale'])
+    return (sales < demand['max_sales']) & (sales > floor)
+
+
+def bounded_lstsq(X, y, lower=0.0):
+    """所有參數 >= lower 的最小平方解 (active set：違反下界者固定在下界後重解)"""
+    free = np.ones(X.shape[1], dtype=bool)
+    params = np.full(X.shape[1], lower, dtype=float)
+    for _ in range(X.shape[1]):
+        residual = y - X[:, ~free] @ params[~free]
+        sol, *_ = np.linalg.lstsq(X[:, free], residual, rcond=None)
+        params[free] = sol
+        violated = free & (params < lower)
+        if not violated.any():
+            break
+        params[violated] = lower
+        free &= ~violated
+    return params
+
+
+def fit(styles, prices, budgets, sales, config=None):
+    config = config or engine.GAME_CONFIG
+    mask = uncensored(budgets, sales, config)
+    X, offset = design_matrix(styles[mask], prices[mask], budgets[mask], config)
+    # 沒有觀測值的店型 (欄全為 0) 沿用原參數；price_slope 各店型共用，只有部分店型的資料時
+    # 也維持原值，否則沒資料的店型 base_traffic 不變、斜率卻跟著改，需求曲線就被連帶改壞
+    known = X.any(axis=0)
+    keys = list(config['styles'])
+    missing = [s for i, s in enumerate(keys) if not known[i]]
+    if missing:
+        known[len(keys)] = False
+    params = current_params(config)
+    y = sales[mask] - offset - X[:, ~known] @ params[~known]
+    params[known] = bounded_lstsq(X[:, known], y)
+    residual = sales[mask] - offset - X @ params
+    total = sales[mask] - sales[mask].mean()
+    return params, {'used': int(mask.sum()), 'censored': int((~mask).sum()), 'missing_styles': missing,
+                    'rmse': float(np.sqrt(np.mean(residual ** 2))) if mask.any() else None,
+                    'r2': float(1 - residual @ residual / (total @ total)) if mask.sum() > 1 and total.any() else None}
+
+
+# --- 3. 依目標分布擬合 ---
+def decisions_to_arrays(decisions, config):
+    styles, prices, budgets = [], [], []
+    for d in decisions:
+        team = engine.new_team(d, config)
+        price = d.get('price') or engine.suggested_price(team, d.get('sales_forecast', 1000), d.get('margin', 50))
+        styles.append(d['style'])
+        prices.append(price)
+        budgets.append(team['estimated_indirect']['行銷'])
+    return np.array(styles), np.array(prices, dtype=float), np.array(budgets, dtype=float)
+
+
+def fit_to_target(target, styles, prices, budgets, config=None, iterations=10):
+    """分位數對應：依目前參數下各店型的預測排名，把目標分位數指派為偽觀測值再擬合，反覆數次"""
+    config = config or engine.GAME_CONFIG
+    X, offset = design_matrix(styles, prices, budgets, config)
+    params = current_params(config)
+    for _ in range(iterations):
+        predicted = X @ params + offset
+        pseudo = np.full(len(styles), np.nan)
+        for key, quantiles in target.items():
+            idx = np.flatnonzero(styles == key)
+            if not len(idx):
+                continue
+            levels = np.array(sorted(float(q) for q in quantiles))
+            values = np.array([quantiles[q] for q in sorted(quantiles, key=float)], dtype=float)
+            ranks = np.argsort(np.argsort(predicted[idx]))
+            pseudo[idx] = np.interp((ranks + 0.5) / len(idx), levels, values)
+        has_target = ~np.isnan(pseudo)
+        new_params, info = fit(styles[has_target], prices[has_target], budgets[has_target],
+                               pseudo[has_target], to_config(params, config))
+        if np.allclose(new_params, params, rtol=1e-6):
+            params = new_params
+            break
+        params = new_params
+    return params, info
+
+
+# --- 4. 輸出 ---
+def to_overrides(params, config):
+    keys = list(config['styles'])
+    k = len(keys)
+    return {'styles': {s: {'base_traffic': int(round(params[i]))} for i, s in enumerate(keys)},
+            'demand': {'price_slope': round(float(params[k]), 4),
+                       'marketing_multiplier': {s: round(float(params[k + 1 + i]), 4) for i, s in enumerate(keys)}}}
+
+
+def to_config(params, config):
+    return engine.merge_config(config, to_overrides(params, config))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--observations', help='觀測值 JSONL')
+    source.add_argument('--records', help='課堂存檔資料夾')
+    source.add_argument('--target', help='目標分位數 JSON')
+    parser.add_argument('--corpus', help='--target 用的決策 JSONL (預設隨機產生)')
+    parser.add_argument('--generate', type=int, default=20000, help='未指定 --corpus 時產生的決策數')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+
+    config = engine.GAME_CONFIG
+    start = time.perf_counter()
+    if args.target:
+        import regress
+        decisions = regress.read_corpus(args.corpus) if args.corpus else regress.generate_corpus(args.generate)
+        with open(args.target, encoding='utf-8') as f:
+            target = json.load(f)
+        params, info = fit_to_target(target, *decisions_to_arrays(decisions, config), config)
+    else:
+        data = read_observations(args.observations) if args.observations else observations_from_records(args.records)
+        params, info = fit(*data, config)
+    elapsed = time.perf_counter() - start
+    if info['missing_styles']:
+        print(f"⚠️ 沒有店型 {', '.join(info['missing_styles'])} 的資料：這些店型的參數與共用的 price_slope "
+              f"維持原值；要校正 price_slope 請提供每個店型的資料", file=sys.stderr)
+
+    overrides = to_overrides(params, config)
+    engine.validate_config(engine.merge_config(config, overrides))
+    for name, old, new in zip(param_names(config), current_params(config), params):
+        print(f"{name:<26} {old:10.2f} -> {new:10.2f}")
+    r2 = f"{info['r2']:.4f}" if info['r2'] is not None else '-'
+    print(f"\n使用 {info['used']:,} 筆 (截斷 {info['censored']:,} 筆)，RMSE {info['rmse'] or 0:.1f}，R² {r2}，{elapsed:.2f} 秒")
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(overrides, f, ensure_ascii=False, indent=2)
+    print(f"已寫入 {args.output}，以 COSTGAME_CONFIG_FILE={args.output} 套用")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
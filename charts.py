@@ -0,0 +1,73 @@
+"""costgame 的圖表與戰報表格 (畫面與 bench.py 共用)。"""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+REPORT_COLUMNS = ['Month', 'Sales', 'Revenue', 'Cost', 'Profit', 'Capital', 'Event']
+
+
+def build_breakeven_chart(team):
+    """第三關損益分析圖：總收入、總成本、BEP 與 AI 預測落點"""
+    bep, ai_sales = team['bep'], team['ai_predicted_sales']
+    fc, dc = team['total_indirect_cost'], team['direct_cost']
+    max_x = max(5000, int(bep * 1.5))
+    x_vals = list(range(0, max_x, int(max_x/100)))
+    df_chart = pd.DataFrame({
+        '銷量': x_vals,
+        '總收入': [team['final_price'] * i for i in x_vals],
+        '總成本': [fc + dc * i for i in x_vals]
+    })
+    fig = px.line(df_chart, x='銷量', y=['總收入', '總成本'], color_discrete_map={'總收入': '#1f77b4', '總成本': '#d62728'})
+    fig.add_vline(x=bep, line_dash="dash", annotation_text="BEP")
+    fig.add_trace(px.scatter(x=[ai_sales], y=[fc + dc * ai_sales], color_discrete_sequence=['#00CC96']).data[0])
+    fig.add_annotation(x=ai_sales, y=fc + dc * ai_sales, text="AI預測落點", showarrow=True, arrowhead=1, yshift=10)
+    return fig
+
+
+class HistoryView:
+    """資金圖與戰報的增量版本 (長期經營模式每月都要顯示，月數最多數十個月)。
+
+    每月只把新的一列寫進預先配置好的欄式緩衝區，並在寫入時就格式化好該列文字；
+    圖只更新既有 trace 的資料，不必每次 rerun 重建整個 DataFrame 與逐格格式化。
+    history 變短或被替換 (回到之前的步驟) 時整個重建。
+    """
+    NUMERIC = ['Sales', 'Revenue', 'Cost', 'Profit', 'Capital']
+
+    def __init__(self, capacity, title="三個月生存戰-資金變化"):
+        self.values = np.zeros((len(self.NUMERIC), capacity), dtype=np.int64)
+        self.rows = []        # 已寫入的 history 列 (用來判斷 history 是否被替換)
+        self.formatted = []   # 已格式化的戰報列
+        self.fig = go.Figure(go.Scatter(x=[], y=[], mode='lines+markers', name='Capital'))
+        self.fig.update_layout(title=title, xaxis_title='Month', yaxis_title='Capital')
+        self.fig.add_hline(y=0, line_dash="dash", line_color="red", annotation_text="破產線")
+
+    @property
+    def size(self):
+        return len(self.rows)
+
+    def _append(self, row):
+        n = self.size
+        if n == self.values.shape[1]:
+            self.values = np.concatenate([self.values, np.zeros_like(self.values)], axis=1)
+        self.values[:, n] = [row[col] for col in self.NUMERIC]
+        self.rows.append(row)
+        self.formatted.append([row['Month'], f"{row['Sales']:,}", f"${row['Revenue']:,}", f"${row['Cost']:,}",
+                               f"${row['Profit']:,}", f"${row['Capital']:,}", row['Event']])
+
+    def sync(self, history):
+        """把 history 新增的列寫入緩衝區，回傳新增列數"""
+        n = self.size
+        if len(history) < n or any(a is not b for a, b in zip(history[max(0, n - 1):n], self.rows[max(0, n - 1):])):
+            self.rows, self.formatted = [], []
+            n = 0
+        for row in history[n:]:
+            self._append(row)
+        added = self.size - n
+        if added:
+            months = [r['Month'] for r in self.rows]
+            self.fig.data[0].update(x=months, y=self.values[self.NUMERIC.index('Capital'), :self.size])
+        return added
+
+    def table(self):
+        return pd.DataFrame(self.formatted, columns=REPORT_COLUMNS)
@@ -0,0 +1,143 @@
+"""老師用的全班資金走勢圖：每一隊從 M0 起每個月的資金，依店型分面並排。
+
+資料由各隊存檔 (records.py) 增量讀入欄式儲存：每隊一列、每月一欄的 numpy 陣列，
+只重讀修改時間有變的檔案，所以新的月份結算後只多讀那幾隊。畫圖時每個店型只有一條
+Scattergl，隊伍之間以 NaN 斷開；500 隊以上也只有幾條 trace，瀏覽器以 WebGL 繪製。
+"""
+import threading
+
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+import records
+from engine import GAME_CONFIG
+
+
+class HistoryStore:
+    """每隊一列的資金陣列 (不足的月份為 NaN)；容量不夠時加倍擴充"""
+
+    def __init__(self, teams=64, months=4):
+        self.capital = np.full((teams, months), np.nan)
+        self.style = np.full(teams, -1, dtype=np.int16)
+        self.names = []
+        self.rows = {}       # 存檔路徑 -> 列
+        self.mtimes = {}     # 存檔路徑 -> 上次讀取時的修改時間
+        self.version = 0     # 有任何一隊更新就 +1，用來判斷圖要不要重畫
+        self.styles = list(GAME_CONFIG['styles'])
+        self.lock = threading.Lock()
+
+    @property
+    def size(self):
+        return len(self.names)
+
+    def _reserve(self, teams, months):
+        rows, cols = self.capital.shape
+        if teams <= rows and months <= cols:
+            return
+        grown = np.full((max(rows * 2, teams) if teams > rows else rows, max(cols, months)), np.nan)
+        grown[:rows, :cols] = self.capital
+        self.capital = grown
+        if len(grown) > len(self.style):
+            self.style = np.concatenate([self.style, np.full(len(grown) - len(self.style), -1, dtype=np.int16)])
+
+    def upsert(self, key, name, style, capitals):
+        row = self.rows.get(key)
+        if row is None:
+            row = self.rows[key] = self.size
+            self.names.append(name)
+        self._reserve(row + 1, len(capitals))
+        self.capital[row] = np.nan
+        self.capital[row, :len(capitals)] = capitals
+        self.style[row] = self.styles.index(style) if style in self.styles else -1
+        self.names[row] = name
+
+    def remove(self, key):
+        """移除一隊 (存檔已刪除，例如重新開始遊戲)：最後一列搬進空出來的位置"""
+        row, last = self.rows.pop(key), self.size - 1
+        if row != last:
+            moved = next(k for k, r in self.rows.items() if r == last)
+            self.rows[moved] = row
+            self.capital[row], self.style[row], self.names[row] = self.capital[last], self.style[last], self.names[last]
+        self.capital[last], self.style[last] = np.nan, -1
+        self.names.pop()
+
+    def refresh(self, record_dir=None):
+        """讀入新增或修改過的存檔、移除已刪除的存檔，回傳更新的隊伍數"""
+        changed = 0
+        with self.lock:
+            paths = records.list_record_paths(record_dir)
+            for gone in set(self.rows) - set(paths):
+                self.remove(gone)
+                self.mtimes.pop(gone, None)
+                changed += 1
+            for path in paths:
+                try:
+                    mtime = path.stat().st_mtime_ns
+                    if self.mtimes.get(path) == mtime:
+                        continue
+                    record = records.load_team_record(path)
+                except (OSError, ValueError):
+                    continue   # 存檔正在被覆寫，下次再讀
+                self.mtimes[path] = mtime
+                data = record['data']
+                history = data.get('history') or []
+                self.upsert(path, record['team'], data.get('style'), [h['Capital'] for h in history])
+                changed += 1
+            if changed:
+                self.version += 1
+        return changed
+
+    def columns(self):
+        """目前資料的唯讀視圖：(資金陣列, 店型代碼, 隊名)"""
+        n = self.size
+        return self.capital[:n], self.style[:n], self.names[:n]
+
+
+def facet_trace(capital, names):
+    """把多隊的資金攤平成一條線：每隊之間插一個 NaN 斷開"""
+    teams, months = capital.shape
+    x = np.tile(np.append(np.arange(months, dtype=float), np.nan), teams)
+    y = np.hstack([capital, np.full((teams, 1), np.nan)]).ravel()
+    text = np.repeat(np.asarray(names, dtype=object), months + 1)
+    return x, y, text
+
+
+def build_class_chart(store):
+    with store.lock:
+        capital, style, names = store.columns()
+        capital, style, names = capital.copy(), style.copy(), list(names)
+    labels = [GAME_CONFIG['styles'][s]['label'] for s in store.styles]
+    fig = make_subplots(rows=1, cols=len(labels), shared_yaxes=True, subplot_titles=labels)
+    months = capital.shape[1]
+    for i in range(len(labels)):
+        mask = (style == i) & ~np.isnan(capital).all(axis=1)
+        if not mask.any():
+            continue
+        x, y, text = facet_trace(capital[mask], [n for n, m in zip(names, mask) if m])
+        fig.add_trace(go.Scattergl(x=x, y=y, text=text, mode='lines', line={'width': 1, 'color': '#1f77b4'},
+                                   opacity=0.35, hovertemplate='%{text}<br>$%{y:,.0f}<extra></extra>',
+                                   showlegend=False), row=1, col=i + 1)
+        # 只對有資料的月份取中位數 (經典隊伍與較長的長期經營隊伍同一面時，後面的月份只有部分隊伍有值)
+        has_data = ~np.isnan(capital[mask]).all(axis=0)
+        median = np.full(months, np.nan)
+        median[has_data] = np.nanmedian(capital[mask][:, has_data], axis=0)
+        fig.add_trace(go.Scatter(x=np.arange(months), y=median, mode='lines+markers', name='中位數',
+                                 line={'width': 3, 'color': '#d62728'}, showlegend=(i == 0)), row=1, col=i + 1)
+    fig.update_xaxes(tickvals=list(range(months)), ticktext=[f"M{m}" for m in range(months)])
+    fig.add_hline(y=0, line_dash="dash", line_color="red")
+    fig.update_layout(height=420, margin={'t': 60, 'b': 30}, title=f"全班資金走勢 ({int(capital.shape[0])} 隊)")
+    return fig
+
+
+STORE = HistoryStore()
+_figure = {'version': None, 'fig': None}
+
+
+def class_chart(record_dir=None):
+    """增量讀入後回傳全班圖；沒有新資料時沿用上次的圖"""
+    STORE.refresh(record_dir)
+    if _figure['version'] != STORE.version:
+        _figure['fig'] = build_class_chart(STORE)
+        _figure['version'] = STORE.version
+    return _figure['fig']
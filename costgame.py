@@ -1,23 +1,28 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
-import plotly.express as px
-import numpy as np
+import contextlib
+import os
 import random
+import uuid
 
-# --- 1. 遊戲參數設定 ---
-GAME_CONFIG = {
-    'styles': {
-        'A': {'label': 'A. 校門口黃金店面 (旗艦店)', 'rent': 50000, 'depreciation': 20000, 'base_traffic': 3000},
-        'B': {'label': 'B. 側門舒適店面 (標準店)', 'rent': 25000, 'depreciation': 12000, 'base_traffic': 1500},
-        'C': {'label': 'C. 巷弄老宅咖啡 (風格店)', 'rent': 10000, 'depreciation': 5000, 'base_traffic': 500}
-    },
-    'beans': {'普通商用豆': 15, '中級莊園豆': 25, '頂級藝妓豆': 40},
-    'milks': {'一般鮮乳': 5, '燕麥奶': 8, '不加奶': 0},
-    'material': 3
-}
+import admission
+import charts
+import classview
+import engine
+import explorer
+import governor
+import metrics
+import prefetch
+import profiler
+import records
+import snapshots
+import state_backend
+from engine import GAME_CONFIG
 
 # --- 2. 初始化 Session State (單人模式) ---
 st.set_page_config(page_title="咖啡廳老闆就是你!", page_icon="☕")
+metrics.start_rerun()
 
 if 'current_stage' not in st.session_state:
     st.session_state.current_stage = 1
@@ -25,11 +30,33 @@ if 'my_cafe_data' not in st.session_state:
     st.session_state.my_cafe_data = {}
 if 'game_started' not in st.session_state:
     st.session_state.game_started = False
+if 'snapshot' not in st.session_state:
+    st.session_state.snapshot = None
+if 'admission' not in st.session_state:
+    st.session_state.admission = admission.new_state()
+
+# 多 worker 模式：以網址上的 ?team=<代碼> 從共用資料庫找回進度 (worker 重啟或換 worker 時)
+if state_backend.ENABLED and not st.session_state.game_started and 'team' in st.query_params:
+    saved = state_backend.load_team(st.query_params['team'])
+    if saved:
+        st.session_state.my_cafe_name = saved['name']
+        st.session_state.my_cafe_data = saved['data']
+        st.session_state.current_stage = saved['stage']
+        st.session_state.team_rev = saved.get('rev', 0)
+        st.session_state.game_started = True
 
 def reset_game():
+    if 'my_cafe_name' in st.session_state:
+        records.delete_team_record(st.session_state.my_cafe_name, team_key())
     st.session_state.current_stage = 1
     st.session_state.my_cafe_data = {}
     st.session_state.game_started = False
+    st.session_state.snapshot = None
+    st.session_state.pop('team_rev', None)
+    governor.drop(get_session_id())
+    if state_backend.ENABLED and 'team' in st.query_params:
+        state_backend.delete('team', st.query_params['team'])
+        del st.query_params['team']
     if 'my_cafe_name' in st.session_state:
         del st.session_state.my_cafe_name
 
@@ -38,17 +65,159 @@ def get_style_label(key): return GAME_CONFIG['styles'][key]['label']
 def get_bean_label(key): return f"{key} (${GAME_CONFIG['beans'][key]})"
 def get_milk_label(key): return f"{key} (${GAME_CONFIG['milks'][key]})"
 
-def predict_sales(style_key, price, marketing_budget):
-    base = GAME_CONFIG['styles'][style_key]['base_traffic']
-    price_factor = (150 - price) * 18 
-    if style_key == 'A':   marketing_effect = np.sqrt(marketing_budget) * 1
-    elif style_key == 'B': marketing_effect = np.sqrt(marketing_budget) * 5
+def end_rerun(shown=True):
+    metrics.end_rerun()
+    profiler.end_rerun()
+    governor.end_rerun(get_session_id())
+    if shown:
+        admission.shown(st.session_state.admission)
+
+def rerun():
+    # 所有 st.rerun() 都經過這裡，讓被中斷的 rerun 也能結束計時與側錄
+    end_rerun(shown=False)
+    st.rerun()
+
+def get_session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else 'local'
+
+def save_record():
+    # 每結算一個月就存檔一次，課後給 report_export.py 批次匯出
+    records.save_team_record(st.session_state.my_cafe_name, team_key(), team_data)
+
+def admit(form):
+    # 連點兩下 (同一畫面上的同一張表單送出兩次) 只算一次
+    return admission.claim(st.session_state.admission, form)
+
+def team_key():
+    # 同一隊的辨識：多 worker 模式為網址上的隊伍代碼 (可能同時開在兩個分頁)，否則就是這個 session
+    return st.query_params.get('team') or get_session_id()
+
+@contextlib.contextmanager
+def team_write():
+    # 同一隊的寫入排隊進行，完成後狀態版本 +1
+    with admission.team_lock(team_key()):
+        if is_stale():
+            reload_team()
+        yield
+        persist_team()
+    admission.committed(st.session_state.admission)
+
+def persist_team():
+    # 多 worker 模式：每次寫入後同步到共用資料庫；另一個分頁或 worker 已先寫入時放棄這次的決定
+    if state_backend.ENABLED and 'team' in st.query_params:
+        rev = state_backend.save_team(st.query_params['team'], st.session_state.my_cafe_name,
+                                      st.session_state.current_stage, st.session_state.my_cafe_data,
+                                      rev=st.session_state.get('team_rev', 0))
+        if rev is None:
+            reload_team()
+        st.session_state.team_rev = rev
+
+def is_stale():
+    if not (state_backend.ENABLED and 'team' in st.query_params):
+        return False
+    saved = state_backend.load_team(st.query_params['team'])
+    return (saved.get('rev', 0) if saved else 0) != st.session_state.get('team_rev', 0)
+
+def reload_team():
+    # 這一隊已在別的分頁更新：改用資料庫裡的進度重新顯示
+    saved = state_backend.load_team(st.query_params['team'])
+    if saved is None:
+        reset_game()
     else:
-        if marketing_budget < 3000: marketing_effect = -300 + (marketing_budget / 3000) * 300
-        else: marketing_effect = np.sqrt(marketing_budget) * 10
-    predicted = base + price_factor + marketing_effect
-    min_guarantee = int(marketing_budget / 500)
-    return int(max(min_guarantee, min(10000, predicted)))
+        st.session_state.my_cafe_data = saved['data']
+        st.session_state.current_stage = saved['stage']
+        st.session_state.team_rev = saved.get('rev', 0)
+        st.session_state.snapshot = None
+    admission.reloaded(st.session_state.admission)
+    st.toast("這一隊已在其他分頁更新，已載入最新進度，請重新決定。")
+    rerun()
+
+def checkpoint(label):
+    # 每個決定生效前存快照 (只記差異)，之後可以回到這一步重新決定
+    st.session_state.snapshot = snapshots.take(st.session_state.snapshot, team_data, label, st.session_state.current_stage)
+
+def render_undo():
+    # 只能回到生存戰之前：各月的結果含亂數 (M3 賭局)，若能回頭就能一直重選到賭贏為止
+    snaps = snapshots.chain(st.session_state.snapshot)
+    if not snaps or st.session_state.current_stage >= 4:
+        return
+    with st.expander("↩️ 回到之前的步驟重新決定"):
+        target = st.selectbox("回到哪一步？", snaps, index=len(snaps) - 1, format_func=lambda s: s.label)
+        if st.button("回到這一步", use_container_width=True) and admit("undo"):
+            with team_write():
+                st.session_state.my_cafe_data, st.session_state.current_stage = snapshots.restore(target)
+                st.session_state.snapshot = target.parent
+                records.save_team_record(st.session_state.my_cafe_name, team_key(), st.session_state.my_cafe_data)
+            rerun()
+
+def prefetch_cache():
+    # 背景預先計算的結果 (Future) 放在 governor，閒置或超過記憶體預算時會被清掉，用到時再重算
+    return governor.artifacts(get_session_id())
+
+def month_outcomes():
+    # 定價時已預先算好 M1~M3 各對策的結果
+    return prefetch.get_bundle(prefetch_cache(), team_data, team_data['final_price'])['outcomes']
+
+def render_history(team):
+    # 資金圖與戰報：HistoryView 每月只加入新的一列 (放在 governor，被清掉時由 history 重建)
+    with admission.heavy('report.final') as admitted:
+        if not admitted:
+            st.caption("伺服器忙碌中，先顯示精簡版戰報。")
+            for h in team['history']:
+                st.text(f"{h['Month']}  損益 ${h['Profit']:,}  資金 ${h['Capital']:,}  {h['Event']}")
+            return
+        total_months = engine.last_month(team)
+        cache = governor.artifacts(get_session_id())
+        key = ('history_view', total_months)
+        if key not in cache:
+            title = f"{total_months} 個月長期經營-資金變化" if 'campaign' in team else "三個月生存戰-資金變化"
+            cache[key] = charts.HistoryView(total_months + 1, title)
+        view = cache[key]
+        with metrics.span('chart.capital'):
+            if view.sync(team['history']):
+                governor.invalidate(get_session_id(), key)
+        st.plotly_chart(view.fig, use_container_width=True)
+        st.table(view.table())
+
+def is_instructor():
+    # 老師以 ?instructor=<金鑰> 開啟；未設定 COSTGAME_INSTRUCTOR_KEY 時一律關閉
+    key = os.environ.get('COSTGAME_INSTRUCTOR_KEY')
+    return bool(key) and st.query_params.get('instructor') == key
+
+def render_metrics_panel():
+    with st.sidebar.expander("📈 效能監控 (老師)", expanded=False):
+        mem = governor.stats()
+        st.metric("快取記憶體", f"{mem['total_bytes'] / 1048576:,.1f} / {mem['budget_bytes'] / 1048576:,.0f} MB")
+        st.caption(f"快取 session 數 {mem['sessions']}，已清除：閒置 {mem['idle_evictions']} 次、"
+                   f"超過預算 {mem['budget_evictions']} 次，共 {mem['evicted_bytes'] / 1048576:,.1f} MB")
+        adm = admission.stats()
+        st.caption(f"重複送出已略過 {adm['duplicates']} 次；圖表繪製 {adm['heavy_admitted']} 次、"
+                   f"精簡版 {adm['heavy_fallback']} 次，目前排隊 {adm['heavy_waiting']} 人")
+        if not metrics.ENABLED:
+            st.caption("未啟用。請以 COSTGAME_METRICS=1 啟動伺服器。")
+            return
+        rows, sizes = metrics.snapshot()
+        timing_rows = [r for r in rows if r['項目'] != 'session_state_bytes']
+        if timing_rows:
+            df_metrics = pd.DataFrame(timing_rows).set_index('項目')
+            for col in ['平均', 'p50', 'p95']:
+                df_metrics[col] = df_metrics[col].map(lambda x: f"{x * 1000:.1f} ms")
+            st.dataframe(df_metrics, use_container_width=True)
+        if sizes:
+            st.metric("Session 數", len(sizes))
+            st.metric("狀態總大小", f"{sum(sizes.values()) / 1024:,.1f} KB")
+        st.caption(f"Prometheus 檔案：{metrics.PROM_FILE}")
+
+def render_class_chart():
+    # 全班每隊的資金走勢 (由 records/ 存檔增量讀入)
+    with st.expander("👩‍🏫 全班資金走勢 (老師)", expanded=False), admission.heavy('chart.class') as admitted:
+        if admitted:
+            st.plotly_chart(classview.class_chart(records.RECORD_DIR), use_container_width=True)
+        else:
+            st.caption("伺服器忙碌中，請稍後再重新整理。")
+
+profiler.start_rerun(get_session_id(), requested=is_instructor() and st.query_params.get('profile') == '1')
 
 # =========================================
 #      學生單人遊玩介面
@@ -59,24 +228,38 @@ if not st.session_state.game_started:
     st.image("https://images.unsplash.com/photo-1511920181103-101a03da40f2?crop=entropy&cs=tinysrgb&fit=max&fm=jpg&ixid=M3wzNTg5fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA&ixlib=rb-4.0.3&q=80&w=1080", caption="準備好成為咖啡大亨了嗎？")
     
     cafe_name_input = st.text_input("請輸入你的「咖啡廳」名稱：")
+    mode = st.radio("遊戲模式", ["經典：三個月生存戰", "長期經營：隨機事件"], horizontal=True)
+    campaign_cfg = GAME_CONFIG['campaign']
+    campaign_months = st.slider("經營月數", campaign_cfg['min_months'], campaign_cfg['max_months'], 24) if mode.startswith("長期") else 0
     if st.button("創立我的咖啡廳！", use_container_width=True):
         if cafe_name_input:
             st.session_state.my_cafe_name = cafe_name_input
             st.session_state.game_started = True
             st.session_state.current_stage = 1
-            st.session_state.my_cafe_data = {}
-            st.rerun()
+            st.session_state.my_cafe_data = {'campaign_months': campaign_months} if campaign_months else {}
+            st.session_state.snapshot = None
+            if state_backend.ENABLED:
+                st.query_params['team'] = uuid.uuid4().hex[:12]
+                st.session_state.team_rev = 0
+                persist_team()
+            rerun()
         else:
             st.error("請給你的咖啡廳一個響亮的名號！")
+    end_rerun()
     st.stop()
 
 team_data = st.session_state.my_cafe_data
 team_name = st.session_state.my_cafe_name
 st.title(f"☕ {team_name} (營運中)")
+metrics.record_state_size(get_session_id(), team_data)
+if is_instructor():
+    render_metrics_panel()
+    render_class_chart()
 
 if st.button("🔄 重新開一家店 (重置遊戲)", type="primary"):
     reset_game()
-    st.rerun()
+    rerun()
+render_undo()
 
 st.markdown("---")
 
@@ -85,7 +268,7 @@ s1_completed = 'style' in team_data
 s1_label = f"第一關：打造你的咖啡廳 {'(已完成)' if s1_completed else ''}"
 is_current_s1 = (st.session_state.current_stage == 1)
 
-with st.expander(s1_label, expanded=is_current_s1):
+with st.expander(s1_label, expanded=is_current_s1), metrics.span('stage.s1'), profiler.stage('s1'):
     with st.form("stage1_form"):
         st.subheader("📍 選擇店面風格")
         style = st.radio("店址決定你的基本客群", GAME_CONFIG['styles'].keys(), format_func=get_style_label, index=list(GAME_CONFIG['styles'].keys()).index(team_data.get('style', 'A')))
@@ -95,13 +278,15 @@ with st.expander(s1_label, expanded=is_current_s1):
         bean = st.radio("選擇咖啡豆", GAME_CONFIG['beans'].keys(), format_func=get_bean_label, index=bean_idx)
         milk = st.radio("選擇搭配乳品", GAME_CONFIG['milks'].keys(), format_func=get_milk_label, index=milk_idx)
         
-        if st.form_submit_button("確認/更新打造", use_container_width=True, disabled=not is_current_s1):
-            dc = GAME_CONFIG['beans'][bean] + GAME_CONFIG['milks'][milk] + GAME_CONFIG['material']
-            team_data.update({'style': style, 'bean': bean, 'milk': milk, 'direct_cost': dc})
+        if st.form_submit_button("確認/更新打造", use_container_width=True, disabled=not is_current_s1) and admit("stage1_form"):
+            dc = engine.direct_cost(bean, milk)
+            with team_write():
+                checkpoint("第一關：打造咖啡廳")
+                team_data.update({'style': style, 'bean': bean, 'milk': milk, 'direct_cost': dc})
+                if st.session_state.current_stage == 1:
+                    st.session_state.current_stage = 2
             st.success(f"打造完成！每杯直接成本 ${dc}")
-            if st.session_state.current_stage == 1:
-                st.session_state.current_stage = 2
-            st.rerun()
+            rerun()
 
 # --- S2: 成本 ---
 if 'style' in team_data:
@@ -109,7 +294,7 @@ if 'style' in team_data:
     s2_label = f"第二關：成本估算 {'(已完成)' if s2_completed else ''}"
     is_current_s2 = (st.session_state.current_stage == 2)
     
-    with st.expander(s2_label, expanded=is_current_s2):
+    with st.expander(s2_label, expanded=is_current_s2), metrics.span('stage.s2'), profiler.stage('s2'):
         style_cfg = GAME_CONFIG['styles'][team_data['style']]
         with st.form("stage2_form"):
             st.info(f"已鎖定 **【{style_cfg['label']}】** 的租金與折舊。")
@@ -120,13 +305,16 @@ if 'style' in team_data:
             op = st.number_input("營業費用", min_value=0, step=1000, value=est.get('營業', 10000))
             mkt = st.number_input("行銷費用", min_value=0, step=1000, value=est.get('行銷', 5000))
             
-            if st.form_submit_button("提交/更新預算", use_container_width=True, disabled=not is_current_s2):
+            if st.form_submit_button("提交/更新預算", use_container_width=True, disabled=not is_current_s2) and admit("stage2_form"):
                 total = rent + dep + staff + op + mkt
-                team_data.update({'estimated_indirect': {'租金': rent, '折舊': dep, '人事': staff, '營業': op, '行銷': mkt}, 'total_indirect_cost': total})
+                with team_write():
+                    checkpoint("第二關：預算")
+                    team_data.update({'estimated_indirect': {'租金': rent, '折舊': dep, '人事': staff, '營業': op, '行銷': mkt}, 'total_indirect_cost': total})
+                    if st.session_state.current_stage == 2:
+                        st.session_state.current_stage = 3
                 st.success(f"預算完成！每月固定成本 ${total:,}")
-                if st.session_state.current_stage == 2:
-                    st.session_state.current_stage = 3
-                st.rerun()
+                prefetch.prefetch_curve(prefetch_cache(), team_data)
+                rerun()
 
 # --- S3: 定價 ---
 if 'total_indirect_cost' in team_data:
@@ -134,7 +322,7 @@ if 'total_indirect_cost' in team_data:
     s3_label = f"第三關：定價策略與市場模擬 {'(已完成)' if s3_completed else ''}"
     is_current_s3 = (st.session_state.current_stage == 3)
     
-    with st.expander(s3_label, expanded=is_current_s3):
+    with st.expander(s3_label, expanded=is_current_s3), metrics.span('stage.s3'), profiler.stage('s3'):
         # 只有在 S3 未完成時，才顯示表單
         if not s3_completed:
             with st.form("stage3_p1"):
@@ -142,12 +330,12 @@ if 'total_indirect_cost' in team_data:
                 sales_forecast = st.number_input("預估月銷量", min_value=100, value=team_data.get('sales_forecast', 1000), step=100)
                 margin = st.slider("期望利潤率 (%)", 0, 200, team_data.get('profit_margin', 50))
                 
-                if st.form_submit_button("試算建議售價", use_container_width=True, disabled=not is_current_s3):
-                    fc = team_data['total_indirect_cost']
-                    dc = team_data['direct_cost']
-                    suggested = (dc + (fc / sales_forecast)) * (1 + margin / 100)
-                    team_data.update({'sales_forecast': sales_forecast, 'profit_margin': margin, 'suggested_price': int(suggested)})
-                    st.rerun()
+                if st.form_submit_button("試算建議售價", use_container_width=True, disabled=not is_current_s3) and admit("stage3_p1"):
+                    suggested = engine.suggested_price(team_data, sales_forecast, margin)
+                    with team_write():
+                        team_data.update({'sales_forecast': sales_forecast, 'profit_margin': margin, 'suggested_price': suggested})
+                    prefetch.prefetch_price(prefetch_cache(), team_data, suggested)
+                    rerun()
 
             if 'suggested_price' in team_data:
                 st.markdown("---")
@@ -159,24 +347,27 @@ if 'total_indirect_cost' in team_data:
                 k3.metric("每杯總成本", f"${int(dc + fc/sf)}")
                 
                 st.info(f"系統建議售價： **${team_data['suggested_price']}**")
+                st.caption("拖拉試算售價，即時查看 AI 預測銷量與損益；按「帶入此售價」填入下方，確認即可。")
+                curve = prefetch.get_curve(prefetch_cache(), team_data)
+                current_p = team_data.get('final_price', team_data['suggested_price'])
+                picked = explorer.price_explorer(curve, team_data, current_p,
+                                                 on_pick=lambda: st.session_state.update(explorer_picked=True))
+                if picked and st.session_state.get('explorer_picked'):
+                    current_p = picked
                 with st.form("stage3_p2"):
-                    final_p = st.number_input("決定最終售價 ($/杯)", min_value=1, value=team_data.get('final_price', team_data['suggested_price']))
+                    final_p = st.number_input("決定最終售價 ($/杯)", min_value=1, value=current_p)
                     
-                    if st.form_submit_button("確認定價，與 AI 對決！", use_container_width=True, disabled=not is_current_s3):
-                        mkt = team_data['estimated_indirect']['行銷']
-                        ai_sales = predict_sales(team_data['style'], final_p, mkt)
-                        revenue = final_p * ai_sales
-                        total_cost = int((dc * ai_sales) + fc)
-                        actual_profit = revenue - total_cost
-                        cm = final_p - dc
-                        bep = fc / cm if cm > 0 else float('inf')
-                        team_data.update({'final_price': final_p, 'ai_predicted_sales': ai_sales, 'actual_profit': actual_profit, 
-                                        's3_revenue': revenue, 's3_cost': total_cost, 'bep': int(bep)})
+                    if st.form_submit_button("確認定價，與 AI 對決！", use_container_width=True, disabled=not is_current_s3) and admit("stage3_p2"):
+                        st.session_state.explorer_picked = False
+                        bundle = prefetch.get_bundle(prefetch_cache(), team_data, final_p)
+                        with team_write():
+                            checkpoint("第三關：定價")
+                            team_data.update(bundle['settled'])
                         
                         # --- 關鍵修改：不再切換 stage ---
                         # if st.session_state.current_stage == 3:
                         #     st.session_state.current_stage = 4 
-                        st.rerun()
+                        rerun()
 
         # --- S3 模擬結果 (含圖表) ---
         if 'ai_predicted_sales' in team_data:
@@ -189,18 +380,12 @@ if 'total_indirect_cost' in team_data:
             c3.metric("本月模擬損益", f"${profit:,}", delta="-虧損" if profit < 0 else "+獲利", delta_color="inverse" if profit < 0 else "normal")
 
             st.markdown("### 📉 損益分析圖")
-            max_x = max(5000, int(bep * 1.5))
-            x_vals = list(range(0, max_x, int(max_x/100)))
-            df_chart = pd.DataFrame({
-                '銷量': x_vals,
-                '總收入': [team_data['final_price'] * i for i in x_vals],
-                '總成本': [team_data['total_indirect_cost'] + team_data['direct_cost'] * i for i in x_vals]
-            })
-            fig = px.line(df_chart, x='銷量', y=['總收入', '總成本'], color_discrete_map={'總收入': '#1f77b4', '總成本': '#d62728'})
-            fig.add_vline(x=bep, line_dash="dash", annotation_text="BEP")
-            fig.add_trace(px.scatter(x=[ai_sales], y=[team_data['total_indirect_cost'] + team_data['direct_cost'] * ai_sales], color_discrete_sequence=['#00CC96']).data[0])
-            fig.add_annotation(x=ai_sales, y=team_data['total_indirect_cost'] + team_data['direct_cost'] * ai_sales, text="AI預測落點", showarrow=True, arrowhead=1, yshift=10)
-            st.plotly_chart(fig, use_container_width=True)
+            with admission.heavy('chart.breakeven') as admitted:
+                if admitted:
+                    fig = prefetch.get_bundle(prefetch_cache(), team_data, team_data['final_price'])['chart']
+                    st.plotly_chart(fig, use_container_width=True)
+                else:
+                    st.caption(f"伺服器忙碌中，先顯示精簡版：損益兩平點約 {bep:,} 杯，AI 預測 {ai_sales:,} 杯。")
 
             if profit > 0 and is_current_s3: st.balloons()
 
@@ -209,10 +394,11 @@ if 'total_indirect_cost' in team_data:
             if 'capital' not in team_data:
                 st.markdown("---")
                 st.header("🔥 挑戰！市場風雲三部曲")
-                st.info("你已完成試營運！接下來，你必須帶領你的咖啡廳，面對連續三個月的殘酷市場挑戰。")
+                campaign_months = team_data.get('campaign_months')
+                challenge = f"連續 {campaign_months} 個月、隨機事件不斷的長期經營挑戰" if campaign_months else "連續三個月的殘酷市場挑戰"
+                st.info(f"你已完成試營運！接下來，你必須帶領你的咖啡廳，面對{challenge}。")
                 
                 s3_profit = team_data.get('actual_profit', 0)
-                initial_capital = max(30000, s3_profit)
                 
                 st.markdown(f"#### 你的開局：\n* **試營運損益：** `${s3_profit:,}`")
 
@@ -223,37 +409,33 @@ if 'total_indirect_cost' in team_data:
                 else:
                     st.success(f"📈 恭喜！你將帶著 `${s3_profit:,}` 的獲利，進入生存戰！")
 
-                if st.button("接受挑戰，進入生存戰！", type="primary", use_container_width=True):
+                if st.button("接受挑戰，進入生存戰！", type="primary", use_container_width=True) and admit("start_survival"):
                     # --- M0 初始化 (從 S4 移到這裡) ---
-                    event_note = "M0 開局" + (" (媽媽贊Z助)" if s3_profit < 30000 else "")
-                    team_data.update({
-                        'capital': initial_capital, 'debt': 0, 's4_month': 1,
-                        'history': [{
-                            'Month': 'M0', 'Event': event_note, 'Sales': team_data.get('ai_predicted_sales', 0),
-                            'Revenue': team_data.get('s3_revenue', 0), 'Cost': team_data.get('s3_cost', 0),
-                            'Profit': s3_profit, 'Capital': initial_capital
-                        }]
-                    })
-                    st.session_state.current_stage = 4 # *現在*才切換到 Stage 4
-                    st.rerun()
+                    with team_write():
+                        st.session_state.snapshot = None   # 進入生存戰後不能再回頭
+                        engine.start_survival(team_data)
+                        if campaign_months:
+                            engine.start_campaign(team_data, campaign_months, random)
+                        save_record()
+                        st.session_state.current_stage = 4 # *現在*才切換到 Stage 4
+                    rerun()
 
 
 # --- 🔥 S4: 市場風雲三部曲 (標題已修改) ---
 # --- 關鍵修改：觸發條件改為 'capital' ---
 if 'capital' in team_data:
     is_current_s4 = (st.session_state.current_stage == 4)
-    s4_label = "🔥 市場風雲三部曲 (進行中)"
+    total_months = engine.last_month(team_data)
+    s4_label = f"🔥 長期經營挑戰 ({total_months} 個月)" if 'campaign' in team_data else "🔥 市場風雲三部曲 (進行中)"
     
-    with st.expander(s4_label, expanded=is_current_s4):
+    with st.expander(s4_label, expanded=is_current_s4), metrics.span('stage.s4'), profiler.stage('s4'):
         
         # --- M0 初始化 (已移至 S3.5) ---
         # (這裡原有的 M0 初始化程式碼已被刪除)
         
         # --- 地下錢莊機制 (Loan Shark) ---
-        if team_data['capital'] <= 0 and team_data['s4_month'] <= 3:
-            loan_amount = 30000
-            team_data['capital'] += loan_amount
-            team_data['debt'] += loan_amount
+        loan_amount = engine.apply_loan_shark(team_data)
+        if loan_amount:
             st.toast(f"💸 資金耗盡！已向地下錢莊借款 ${loan_amount:,} 續命！", icon="💀")
 
         # --- 資金看板 (含負債) ---
@@ -263,96 +445,34 @@ if 'capital' in team_data:
         if debt > 0:
             c2.metric("💀 累積負債 (高利貸)", f"${debt:,}", delta="+10% 月利息", delta_color="inverse")
 
-        # --- M1 ---
-        if team_data['s4_month'] == 1:
-            with st.form("m1"):
-                st.subheader("📅 Month 1: 通膨來襲")
-                st.error("💥 突發事件：全球乳牛集體罷工抗爭，牛奶成本即日起暴漲 100%！")
-                options_m1 = ["A. 佛心凍漲", "B. 漲價反映", "C. 我沒賣牛奶~爽!"]
-                captions_m1 = ["我是開良心事業的，成本我自己吞！", "抱歉了錢錢，我真的需要那個酷東西。售價+20%！", "哈哈哈哈你們忙，我先走了"]
-                choice = st.radio("老闆請選擇對策：", options=options_m1, captions=captions_m1)
+        # --- 每月事件 (經典模式依序 M1~M3；長期經營模式由事件集抽出) ---
+        month = team_data['s4_month']
+        if month <= total_months:
+            event_id = engine.month_event(team_data, month)
+            event = engine.MONTH_EVENTS[event_id]
+            with st.form(f"m{month}"):
+                st.subheader(f"📅 Month {month}: {event['title']}")
+                getattr(st, event['level'])(event['text'])
+                choice = st.radio("老闆請選擇對策：", options=engine.MONTH_OPTIONS[event_id], captions=event['captions'])
                 
                 if st.form_submit_button("確定決策", use_container_width=True):
-                    if choice.startswith("C") and team_data['milk'] == '一般鮮乳':
-                        st.error("😡 騙人！你第一關明明就選了要加鮮奶！請誠實面對你的成本！")
+                    if not engine.is_valid_choice(team_data, event_id, choice):
+                        st.error(event['invalid'])
+                        end_rerun()
                         st.stop()
                     
-                    dc, price, milk_cost = team_data['direct_cost'], team_data['final_price'], GAME_CONFIG['milks'][team_data['milk']]
-                    milk_cost_increase = 0
-                    if team_data['milk'] == '一般鮮乳':
-                        if choice.startswith("A"): milk_cost_increase = milk_cost 
-                        elif choice.startswith("B"): milk_cost_increase = milk_cost
-                    
-                    new_dc = dc + milk_cost_increase
-                    new_price = int(price * 1.2) if choice.startswith("B") else price
-                    
-                    sales = predict_sales(team_data['style'], new_price, team_data['estimated_indirect']['行銷'])
-                    revenue = int(new_price * sales)
-                    interest = int(team_data['debt'] * 0.1)
-                    total_cost = int((new_dc * sales) + team_data['total_indirect_cost'] + interest)
-                    profit = revenue - total_cost
-                    
-                    team_data['capital'] += profit
-                    team_data['history'].append({'Month': 'M1', 'Event': choice, 'Sales': sales, 'Revenue': revenue, 'Cost': total_cost, 'Profit': profit, 'Capital': team_data['capital']})
-                    team_data['s4_month'] = 2
-                    st.rerun()
-        
-        # --- M2 ---
-        elif team_data['s4_month'] == 2:
-            with st.form("m2"):
-                st.subheader("📅 Month 2: 紅海競爭")
-                st.warning("⚔️ 突發事件：校長千金在校園正中心開豪華咖啡廳慶開幕全品項咖啡打1折！")
-                options_m2 = ["A. 割喉跟進", "B. 品牌固樁", "C. 躺平就好"]
-                captions_m2 = ["跟他拚了！售價打5折，保住客流", "追加$3萬買網軍，客流僅-10%", "我就爛！讓他玩一個月，客流-75%"]
-                choice = st.radio("老闆請選擇對策：", options=options_m2, captions=captions_m2)
-                
-                if st.form_submit_button("確定決策", use_container_width=True):
-                    base_sales, price, fc = team_data.get('ai_predicted_sales', 1000), team_data['final_price'], team_data['total_indirect_cost']
-                    if choice.startswith("A"): new_price, sales, new_fc = int(price * 0.5), base_sales, fc
-                    elif choice.startswith("B"): new_price, sales, new_fc = price, int(base_sales * 0.9), fc + 30000
-                    else: new_price, sales, new_fc = price, int(base_sales * 0.25), fc
-                    
-                    revenue = int(new_price * sales)
-                    interest = int(team_data['debt'] * 0.1)
-                    total_cost = int((team_data['direct_cost'] * sales) + new_fc + interest)
-                    profit = revenue - total_cost
-                    
-                    team_data['capital'] += profit
-                    team_data['history'].append({'Month': 'M2', 'Event': choice, 'Sales': sales, 'Revenue': revenue, 'Cost': total_cost, 'Profit': profit, 'Capital': team_data['capital']})
-                    team_data['s4_month'] = 3
-                    st.rerun()
-
-        # --- M3 ---
-        elif team_data['s4_month'] == 3:
-            with st.form("m3"):
-                st.subheader("📅 Month 3: 營運災難")
-                st.error("💣 突發事件：一位生科系同學試圖用你的咖啡機萃取『賢者之石』，引發小規模爆炸！主設備全毀！")
-                options_m3 = ["A. 買二手應急", "B. 租賃新機", "C. 手沖硬撐"]
-                captions_m3 = ["賭運氣！花$8萬, 維持產能但有30%機率再爆", "穩健！花$4萬, T產能有上限", "守財奴！不花錢, 產能上限低!"]
-                choice = st.radio("老闆請選擇對策：", options=options_m3, captions=captions_m3)
-                
-                if st.form_submit_button("確定決策", use_container_width=True):
-                    base_sales, fc = team_data.get('ai_predicted_sales', 1000), team_data['total_indirect_cost']
-                    if choice.startswith("A"):
-                        new_fc = fc + 80000
-                        is_fail = random.random() < 0.3
-                        sales = int(base_sales * 0.5) if is_fail else base_sales
-                        note = " (💥賭輸爆炸!)" if is_fail else " (✨賭贏了!)"
-                    elif choice.startswith("B"): new_fc, sales, note = fc + 40000, min(base_sales, 2000), ""
-                    else: new_fc, sales, note = fc, min(base_sales, 800), ""
-                    
-                    revenue = int(team_data['final_price'] * sales)
-                    interest = int(team_data['debt'] * 0.1)
-                    total_cost = int((team_data['direct_cost'] * sales) + new_fc + interest)
-                    profit = revenue - total_cost
-                    
-                    team_data['capital'] += profit
-                    team_data['history'].append({'Month': 'M3', 'Event': choice + note, 'Sales': sales, 'Revenue': revenue, 'Cost': total_cost, 'Profit': profit, 'Capital': team_data['capital']})
-                    team_data['s4_month'] = 4
-                    st.rerun()
+                    if admit(f"m{month}"):
+                        with team_write():
+                            engine.play_month(team_data, month, choice, outcomes=month_outcomes())
+                            save_record()
+                        rerun()
+
+            # 長期經營模式每個月都看得到目前的資金走勢與戰報
+            if 'campaign' in team_data and month > 1:
+                render_history(team_data)
 
         # --- 結算 ---
-        if team_data.get('s4_month') == 4:
+        if engine.is_finished(team_data):
             final_capital = team_data['capital']
             final_debt = team_data['debt']
             net_assets = final_capital - final_debt
@@ -363,17 +483,10 @@ if 'capital' in team_data:
             else:
                 st.error(f"💀 遊戲結束！你雖然撐完了，但資不抵債，淨資產為 -${abs(net_assets):,}")
 
-            df_hist = pd.DataFrame(team_data['history'])
-            fig = px.line(df_hist, x='Month', y='Capital', markers=True, title="三個月生存戰-資金變化")
-            fig.add_hline(y=0, line_dash="dash", line_color="red", annotation_text="破產線")
-            st.plotly_chart(fig, use_container_width=True)
-
             st.subheader("📋 最終營運戰報")
-            df_display = df_hist.copy()
-            for col in ['Sales']: df_display[col] = df_display[col].apply(lambda x: f"{x:,}")
-            for col in ['Revenue', 'Cost', 'Profit', 'Capital']:
-                df_display[col] = df_display[col].apply(lambda x: f"${x:,}")
-            st.table(df_display[['Month', 'Sales', 'Revenue', 'Cost', 'Profit', 'Capital', 'Event']])
+            render_history(team_data)
             
             if final_debt > 0:
-                st.warning(f"📢 注意：你目前仍欠地下錢莊 ${final_debt:,}，上述 Capital 尚未扣除此負債。")
\ No newline at end of file
+                st.warning(f"📢 注意：你目前仍欠地下錢莊 ${final_debt:,}，上述 Capital 尚未扣除此負債。")
+
+end_rerun()
@@ -0,0 +1,129 @@
+"""在同一台機器上啟動多個 costgame worker，前面以 nginx 做黏著 (sticky) 反向代理。
+
+一個 Streamlit 行程只能用到一顆 CPU 核心 (GIL)；大班上課時開多個 worker 分攤。
+所有 worker 共用同一個 SQLite 狀態檔 (state_backend.py)，學生的進度存在網址的
+?team=<代碼> 底下，任何 worker 都能接手。
+
+    python deploy/launch.py --workers 4                 # worker 開在 8501~8504，產生 deploy/nginx.conf
+    nginx -c "$PWD/deploy/nginx.conf"                   # 學生連 http://<主機>:8080
+
+nginx 以 cookie 做一致性雜湊：第一次連線時以 request id 產生 cookie，之後同一個瀏覽器
+(含 Streamlit 的 websocket) 都送到同一個 worker；worker 掛掉時 nginx 改送其他 worker，
+學生重新整理即可由 ?team= 接續進度。Ctrl+C 會一併結束所有 worker。
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+NGINX_TEMPLATE = """worker_processes auto;
+pid {pid};
+error_log {error_log};
+events {{ worker_connections 4096; }}
+
+http {{
+    access_log off;
+    map $cookie_costgame_sticky $costgame_sticky {{
+        ""      $request_id;
+        default $cookie_costgame_sticky;
+    }}
+    map $http_upgrade $connection_upgrade {{
+        default upgrade;
+        ""      close;
+    }}
+    upstream costgame {{
+        hash $costgame_sticky consistent;
+{servers}
+    }}
+    server {{
+        listen {listen};
+        location / {{
+            proxy_pass http://costgame;
+            proxy_http_version 1.1;
+            proxy_set_header Host $host;
+            proxy_set_header Upgrade $http_upgrade;
+            proxy_set_header Connection $connection_upgrade;
+            proxy_read_timeout 1h;
+            add_header Set-Cookie "costgame_sticky=$costgame_sticky; Path=/; HttpOnly; SameSite=Lax";
+        }}
+    }}
+}}
+"""
+
+
+def nginx_conf(ports, listen, run_dir):
+    servers = '\n'.join(f"        server 127.0.0.1:{p} max_fails=1 fail_timeout=5s;" for p in ports)
+    return NGINX_TEMPLATE.format(servers=servers, listen=listen, pid=run_dir / 'nginx.pid',
+                                 error_log=run_dir / 'nginx_error.log')
+
+
+def worker_command(port):
+    return [sys.executable, '-m', 'streamlit', 'run', str(ROOT / 'costgame.py'),
+            '--server.port', str(port), '--server.headless', 'true']
+
+
+def start_workers(n, base_port, db_path, log_dir):
+    env = dict(os.environ, COSTGAME_STATE_DB=str(db_path))
+    log_dir.mkdir(parents=True, exist_ok=True)
+    procs = []
+    for i in range(n):
+        port = base_port + i
+        log = open(log_dir / f"worker-{port}.log", 'w', encoding='utf-8')
+        procs.append(subprocess.Popen(worker_command(port), cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT))
+    return procs
+
+
+def _terminate(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--base-port', type=int, default=8501)
+    parser.add_argument('--listen', type=int, default=8080, help='nginx 對外的 port')
+    parser.add_argument('--db', default=str(ROOT / 'costgame_state.db'), help='共用的 SQLite 狀態檔')
+    parser.add_argument('--run-dir', default=str(ROOT / 'deploy' / 'run'), help='worker 日誌與 nginx pid 的位置')
+    parser.add_argument('--nginx-conf', default=str(ROOT / 'deploy' / 'nginx.conf'))
+    args = parser.parse_args(argv)
+
+    run_dir = Path(args.run_dir).resolve()
+    ports = [args.base_port + i for i in range(args.workers)]
+    run_dir.mkdir(parents=True, exist_ok=True)
+    Path(args.nginx_conf).write_text(nginx_conf(ports, args.listen, run_dir), encoding='utf-8')
+    print(f"nginx 設定已寫入 {args.nginx_conf}，以 nginx -c {Path(args.nginx_conf).resolve()} 啟動")
+
+    # 被 systemd / kill 結束時也要收掉 worker
+    signal.signal(signal.SIGTERM, _terminate)
+    procs = start_workers(args.workers, args.base_port, Path(args.db).resolve(), run_dir)
+    print(f"已啟動 {len(procs)} 個 worker：port {ports[0]}~{ports[-1]}，狀態檔 {args.db}")
+    try:
+        # 個別 worker 結束時 nginx 會改送其他 worker，這裡只提醒；全部結束才離開
+        dead = set()
+        while len(dead) < len(procs):
+            for port, p in zip(ports, procs):
+                if port not in dead and p.poll() is not None:
+                    dead.add(port)
+                    print(f"worker {port} 已結束 (exit {p.returncode})，日誌見 {run_dir}", file=sys.stderr)
+            time.sleep(1)
+        return 1
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        for p in procs:
+            if p.poll() is None:
+                p.send_signal(signal.SIGTERM)
+        for p in procs:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,364 @@
+"""咖啡廳經營遊戲的規則引擎 (不依賴 Streamlit / plotly，可單獨匯入)。
+
+costgame.py 的畫面、bench.py 的效能測試都從這裡取用遊戲參數與計算。
+所有回合函式都直接修改傳入的 team dict，與畫面中的 team_data 相同格式。
+"""
+import copy
+import functools
+import json
+import os
+import random
+
+import numpy as np
+
+# --- 1. 遊戲參數設定 ---
+GAME_CONFIG = {
+    'styles': {
+        'A': {'label': 'A. 校門口黃金店面 (旗艦店)', 'rent': 50000, 'depreciation': 20000, 'base_traffic': 3000},
+        'B': {'label': 'B. 側門舒適店面 (標準店)', 'rent': 25000, 'depreciation': 12000, 'base_traffic': 1500},
+        'C': {'label': 'C. 巷弄老宅咖啡 (風格店)', 'rent': 10000, 'depreciation': 5000, 'base_traffic': 500}
+    },
+    'beans': {'普通商用豆': 15, '中級莊園豆': 25, '頂級藝妓豆': 40},
+    'milks': {'一般鮮乳': 5, '燕麥奶': 8, '不加奶': 0},
+    'material': 3,
+    # AI 銷量模型：基本客流 + (參考價 - 售價) x 價格斜率 + 行銷效果，再夾在保底與上限之間
+    'demand': {
+        'reference_price': 150,
+        'price_slope': 18,                                   # 每降價 $1 多賣幾杯
+        'marketing_multiplier': {'A': 1, 'B': 5, 'C': 10},   # 行銷效果 = sqrt(行銷費) x 倍數
+        'low_budget_penalty': {'C': 300},                    # 行銷費低於門檻時改為負效果 (巷弄店沒人知道)
+        'low_budget_threshold': 3000,
+        'max_sales': 10000,
+        'budget_per_min_sale': 500,                          # 每 $500 行銷費保底一杯
+    },
+    # 長期經營模式：每個月從事件集 (MONTH_EVENTS) 中依權重抽一個事件
+    'campaign': {
+        'min_months': 12,
+        'max_months': 36,
+        'event_weights': {'inflation': 1, 'competition': 1, 'disaster': 1},
+    }
+}
+
+
+def merge_config(base, overrides):
+    """回傳 base 深拷貝後套用巢狀 overrides 的新設定"""
+    merged = copy.deepcopy(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def validate_config(config):
+    """檢查設定是否能讓遊戲正常運作，有問題就丟出 ValueError"""
+    styles, demand = config['styles'], config['demand']
+    problems = []
+    for key, cfg in styles.items():
+        if cfg['base_traffic'] < 0:
+            problems.append(f"styles.{key}.base_traffic 不可為負")
+        if demand['marketing_multiplier'].get(key, -1) < 0:
+            problems.append(f"demand.marketing_multiplier.{key} 缺少或為負")
+    if demand['price_slope'] <= 0:
+        problems.append("demand.price_slope 必須為正 (售價越高賣越少)")
+    for key in ('reference_price', 'max_sales', 'budget_per_min_sale', 'low_budget_threshold'):
+        if demand[key] <= 0:
+            problems.append(f"demand.{key} 必須為正")
+    campaign = config.get('campaign')
+    if campaign:
+        if not 1 <= campaign['min_months'] <= campaign['max_months']:
+            problems.append("campaign.min_months 必須介於 1 與 max_months 之間")
+        weights = campaign['event_weights']
+        if any(key not in EVENT_IDS for key in weights):
+            problems.append(f"campaign.event_weights 只能使用 {', '.join(EVENT_IDS)}")
+        if any(w < 0 for w in weights.values()) or not sum(weights.values()) > 0:
+            problems.append("campaign.event_weights 不可為負且總和必須為正")
+    if problems:
+        raise ValueError('；'.join(problems))
+    return config
+
+
+def load_config_file(path, base=None):
+    """讀取 JSON 設定覆寫檔 (例如 calibrate.py 的輸出)，與 base 合併並驗證"""
+    with open(path, encoding='utf-8') as f:
+        return validate_config(merge_config(base or GAME_CONFIG, json.load(f)))
+
+
+# 生存戰事件 (代碼即經典模式的月份，也是 MONTH_OPTIONS 與 month_outcome 的規則分支)
+MONTH_EVENTS = {
+    1: {'key': 'inflation', 'title': '通膨來襲', 'level': 'error',
+        'text': '💥 突發事件：全球乳牛集體罷工抗爭，牛奶成本即日起暴漲 100%！',
+        'captions': ["我是開良心事業的，成本我自己吞！", "抱歉了錢錢，我真的需要那個酷東西。售價+20%！", "哈哈哈哈你們忙，我先走了"],
+        'invalid': '😡 騙人！你第一關明明就選了要加鮮奶！請誠實面對你的成本！'},
+    2: {'key': 'competition', 'title': '紅海競爭', 'level': 'warning',
+        'text': '⚔️ 突發事件：校長千金在校園正中心開豪華咖啡廳慶開幕全品項咖啡打1折！',
+        'captions': ["跟他拚了！售價打5折，保住客流", "追加$3萬買網軍，客流僅-10%", "我就爛！讓他玩一個月，客流-75%"]},
+    3: {'key': 'disaster', 'title': '營運災難', 'level': 'error',
+        'text': '💣 突發事件：一位生科系同學試圖用你的咖啡機萃取『賢者之石』，引發小規模爆炸！主設備全毀！',
+        'captions': ["賭運氣！花$8萬, 維持產能但有30%機率再爆", "穩健！花$4萬, T產能有上限", "守財奴！不花錢, 產能上限低!"]},
+}
+EVENT_IDS = {event['key']: event_id for event_id, event in MONTH_EVENTS.items()}
+
+
+# 以 COSTGAME_CONFIG_FILE 指定覆寫檔時，整個遊戲改用校正後的參數
+if os.environ.get('COSTGAME_CONFIG_FILE'):
+    GAME_CONFIG = load_config_file(os.environ['COSTGAME_CONFIG_FILE'])
+
+STARTING_CAPITAL = 30000   # 媽媽贊助的保底資金
+LOAN_AMOUNT = 30000        # 地下錢莊每次借款
+INTEREST_RATE = 0.1        # 高利貸月利息
+LAST_MONTH = 3
+GAMBLE_FAIL_RATE = 0.3     # M3 買二手機再爆炸的機率
+
+# 生存戰各月對策 (選項文字的第一個字母決定規則分支)
+MONTH_OPTIONS = {
+    1: ["A. 佛心凍漲", "B. 漲價反映", "C. 我沒賣牛奶~爽!"],
+    2: ["A. 割喉跟進", "B. 品牌固樁", "C. 躺平就好"],
+    3: ["A. 買二手應急", "B. 租賃新機", "C. 手沖硬撐"],
+}
+
+
+# --- 2. AI 銷量預測 ---
+def predict_sales(style_key, price, marketing_budget, config=GAME_CONFIG):
+    demand = config.get('demand', GAME_CONFIG['demand'])
+    base = config['styles'][style_key]['base_traffic']
+    price_factor = (demand['reference_price'] - price) * demand['price_slope']
+    penalty = demand['low_budget_penalty'].get(style_key)
+    threshold = demand['low_budget_threshold']
+    if penalty and marketing_budget < threshold:
+        marketing_effect = -penalty + (marketing_budget / threshold) * penalty
+    else:
+        marketing_effect = np.sqrt(marketing_budget) * demand['marketing_multiplier'][style_key]
+    predicted = base + price_factor + marketing_effect
+    min_guarantee = int(marketing_budget / demand['budget_per_min_sale'])
+    return int(max(min_guarantee, min(demand['max_sales'], predicted)))
+
+
+def predict_sales_batch(styles, prices, marketing_budgets, config=GAME_CONFIG):
+    """predict_sales 的向量化版本，逐筆結果與純量版完全相同"""
+    demand = config.get('demand', GAME_CONFIG['demand'])
+    styles = np.asarray(styles)
+    prices = np.asarray(prices, dtype=float)
+    budgets = np.asarray(marketing_budgets, dtype=float)
+    shape = np.broadcast(styles, prices, budgets).shape
+    base = np.zeros(shape)
+    marketing_effect = np.zeros(shape)
+    root = np.sqrt(budgets)
+    threshold = demand['low_budget_threshold']
+    for key, cfg in config['styles'].items():
+        is_style = styles == key
+        base = np.where(is_style, cfg['base_traffic'], base)
+        effect = root * demand['marketing_multiplier'][key]
+        penalty = demand['low_budget_penalty'].get(key)
+        if penalty:
+            effect = np.where(budgets < threshold, -penalty + (budgets / threshold) * penalty, effect)
+        marketing_effect = np.where(is_style, effect, marketing_effect)
+    price_factor = (demand['reference_price'] - prices) * demand['price_slope']
+    predicted = base + price_factor + marketing_effect
+    min_guarantee = np.trunc(budgets / demand['budget_per_min_sale'])
+    return np.trunc(np.maximum(min_guarantee, np.minimum(demand['max_sales'], predicted))).astype(np.int64)
+
+
+# --- 3. 各關卡計算 ---
+def direct_cost(bean, milk, config=GAME_CONFIG):
+    return config['beans'][bean] + config['milks'][milk] + config['material']
+
+
+def suggested_price(team, sales_forecast, margin):
+    return int((team['direct_cost'] + (team['total_indirect_cost'] / sales_forecast)) * (1 + margin / 100))
+
+
+def settle_pricing(team, final_p, sales_fn=None):
+    """第三關：依最終售價計算 AI 銷量與試營運損益"""
+    dc, fc = team['direct_cost'], team['total_indirect_cost']
+    mkt = team['estimated_indirect']['行銷']
+    ai_sales = (sales_fn or predict_sales)(team['style'], final_p, mkt)
+    revenue = final_p * ai_sales
+    total_cost = int((dc * ai_sales) + fc)
+    actual_profit = revenue - total_cost
+    cm = final_p - dc
+    bep = fc / cm if cm > 0 else float('inf')
+    team.update({'final_price': final_p, 'ai_predicted_sales': ai_sales, 'actual_profit': actual_profit,
+                 's3_revenue': revenue, 's3_cost': total_cost, 'bep': int(bep)})
+
+
+def start_survival(team):
+    """M0 開局：試營運獲利不足時由媽媽補足起始資金"""
+    s3_profit = team.get('actual_profit', 0)
+    initial_capital = max(STARTING_CAPITAL, s3_profit)
+    event_note = "M0 開局" + (" (媽媽贊Z助)" if s3_profit < STARTING_CAPITAL else "")
+    team.update({
+        'capital': initial_capital, 'debt': 0, 's4_month': 1,
+        'history': [{
+            'Month': 'M0', 'Event': event_note, 'Sales': team.get('ai_predicted_sales', 0),
+            'Revenue': team.get('s3_revenue', 0), 'Cost': team.get('s3_cost', 0),
+            'Profit': s3_profit, 'Capital': initial_capital
+        }]
+    })
+
+
+def apply_loan_shark(team):
+    """資金耗盡時向地下錢莊借款，回傳借款金額 (沒借則為 0)"""
+    if team['capital'] <= 0 and team['s4_month'] <= last_month(team):
+        team['capital'] += LOAN_AMOUNT
+        team['debt'] += LOAN_AMOUNT
+        return LOAN_AMOUNT
+    return 0
+
+
+def is_valid_choice(team, event, choice):
+    # 通膨事件選 C (沒賣牛奶) 但第一關選了鮮奶 => 說謊
+    return not (event == 1 and choice.startswith("C") and team['milk'] == '一般鮮乳')
+
+
+def start_campaign(team, months, rng=random, config=GAME_CONFIG):
+    """長期經營模式：在 start_survival 之後呼叫，預先抽好每個月的事件"""
+    campaign = config.get('campaign', GAME_CONFIG['campaign'])
+    if not campaign['min_months'] <= months <= campaign['max_months']:
+        raise ValueError(f"長期經營月數必須介於 {campaign['min_months']} 與 {campaign['max_months']} 之間")
+    keys = list(campaign['event_weights'])
+    drawn = rng.choices(keys, [campaign['event_weights'][k] for k in keys], k=months)
+    team['campaign'] = {'months': months, 'events': [EVENT_IDS[k] for k in drawn]}
+
+
+def last_month(team):
+    return team['campaign']['months'] if 'campaign' in team else LAST_MONTH
+
+
+def month_event(team, month):
+    """第 month 個月的事件代碼；經典模式即月份本身"""
+    return team['campaign']['events'][month - 1] if 'campaign' in team else month
+
+
+def is_finished(team):
+    return team.get('s4_month', 0) > last_month(team)
+
+
+def month_outcome(team, month, choice, rng=random, sales_fn=None, config=GAME_CONFIG):
+    """計算某個事件 (經典模式即月份)、某個對策的銷量、營收與未含利息的成本"""
+    predict = sales_fn or predict_sales
+    note = ""
+    if month == 1:
+        dc, price, milk_cost = team['direct_cost'], team['final_price'], config['milks'][team['milk']]
+        milk_cost_increase = 0
+        if team['milk'] == '一般鮮乳':
+            if choice.startswith("A"): milk_cost_increase = milk_cost
+            elif choice.startswith("B"): milk_cost_increase = milk_cost
+        new_dc = dc + milk_cost_increase
+        new_price = int(price * 1.2) if choice.startswith("B") else price
+        sales = predict(team['style'], new_price, team['estimated_indirect']['行銷'])
+        revenue = int(new_price * sales)
+        cost = (new_dc * sales) + team['total_indirect_cost']
+    elif month == 2:
+        base_sales, price, fc = team.get('ai_predicted_sales', 1000), team['final_price'], team['total_indirect_cost']
+        if choice.startswith("A"): new_price, sales, new_fc = int(price * 0.5), base_sales, fc
+        elif choice.startswith("B"): new_price, sales, new_fc = price, int(base_sales * 0.9), fc + 30000
+        else: new_price, sales, new_fc = price, int(base_sales * 0.25), fc
+        revenue = int(new_price * sales)
+        cost = (team['direct_cost'] * sales) + new_fc
+    else:
+        base_sales, fc = team.get('ai_predicted_sales', 1000), team['total_indirect_cost']
+        if choice.startswith("A"):
+            new_fc = fc + 80000
+            is_fail = rng.random() < GAMBLE_FAIL_RATE
+            sales = int(base_sales * 0.5) if is_fail else base_sales
+            note = " (💥賭輸爆炸!)" if is_fail else " (✨賭贏了!)"
+        elif choice.startswith("B"): new_fc, sales = fc + 40000, min(base_sales, 2000)
+        else: new_fc, sales = fc, min(base_sales, 800)
+        revenue = int(team['final_price'] * sales)
+        cost = (team['direct_cost'] * sales) + new_fc
+    return {'sales': sales, 'revenue': revenue, 'cost': cost, 'note': note}
+
+
+class _FixedDraw:
+    # 取代 rng，讓 month_outcome 算出指定的賭局結果
+    def __init__(self, value):
+        self.value = value
+
+    def random(self):
+        return self.value
+
+
+def outcome_table(team, sales_fn=None, config=GAME_CONFIG):
+    """預先算好 M1~M3 每個對策的結果，key 為 (月份, 對策字母)，value 為 (賭贏, 賭輸)。
+
+    各月結果只取決於前三關的設定 (不受當時資金與負債影響)，因此第三關定價後即可算好；
+    沒有賭局的對策兩者相同。
+    """
+    return {(month, label[0]): (month_outcome(team, month, label, _FixedDraw(1.0), sales_fn, config),
+                                month_outcome(team, month, label, _FixedDraw(0.0), sales_fn, config))
+            for month, options in MONTH_OPTIONS.items() for label in options}
+
+
+def play_month(team, month, choice, rng=random, sales_fn=None, config=GAME_CONFIG, outcomes=None):
+    """結算一個月：扣利息、更新資金並寫入 history，回傳該月紀錄。
+
+    當月事件由 month_event() 決定；outcomes 為 outcome_table() 的結果時直接查表，不再重新計算。
+    """
+    event = month_event(team, month)
+    if outcomes is None:
+        outcome = month_outcome(team, event, choice, rng, sales_fn, config)
+    else:
+        win, lose = outcomes[(event, choice[:1])]
+        outcome = win if win == lose else (lose if rng.random() < GAMBLE_FAIL_RATE else win)
+    interest = int(team['debt'] * INTEREST_RATE)
+    total_cost = int(outcome['cost'] + interest)
+    profit = outcome['revenue'] - total_cost
+    team['capital'] += profit
+    row = {'Month': f'M{month}', 'Event': choice + outcome['note'], 'Sales': outcome['sales'],
+           'Revenue': outcome['revenue'], 'Cost': total_cost, 'Profit': profit, 'Capital': team['capital']}
+    team['history'].append(row)
+    team['s4_month'] = month + 1
+    return row
+
+
+# --- 4. 腳本化的一整局 (不經畫面) ---
+# decision 格式 (JSONL 每行一局)：
+#   {"style": "A", "bean": "普通商用豆", "milk": "一般鮮乳",
+#    "staff": 30000, "op": 10000, "mkt": 5000,
+#    "sales_forecast": 1000, "margin": 50, "price": 120,
+#    "choices": ["A", "B", "C"], "seed": 7}
+# price 省略時採系統建議售價；choices 可寫字母或完整選項文字。
+# 加上 "months": 24 即為長期經營模式，choices 依序對應每個月 (事件由 seed 抽出)。
+def option_label(event, choice):
+    for label in MONTH_OPTIONS[event]:
+        if label.startswith(choice[:1]):
+            return label
+    raise ValueError(f"事件 {event} 沒有對策 {choice!r}")
+
+
+def new_team(decision, config=GAME_CONFIG):
+    """依 decision 完成第一、二關，回傳 team dict"""
+    style_cfg = config['styles'][decision['style']]
+    est = {'租金': style_cfg['rent'], '折舊': style_cfg['depreciation'], '人事': decision.get('staff', 30000),
+           '營業': decision.get('op', 10000), '行銷': decision.get('mkt', 5000)}
+    return {'style': decision['style'], 'bean': decision['bean'], 'milk': decision['milk'],
+            'direct_cost': direct_cost(decision['bean'], decision['milk'], config),
+            'estimated_indirect': est, 'total_indirect_cost': sum(est.values())}
+
+
+def play_game(decision, rng=None, sales_fn=None, config=GAME_CONFIG):
+    """照畫面的順序玩完一整局 (S1~S3、M0 起各月)，回傳最終的 team dict。
+
+    M1 選了不合法的對策 (有加鮮奶卻選 C) 會丟出 ValueError，與畫面上的拒絕相同。
+    """
+    rng = rng or random.Random(decision.get('seed'))
+    sales_fn = sales_fn or functools.partial(predict_sales, config=config)
+    team = new_team(decision, config)
+    sales_forecast = decision.get('sales_forecast', 1000)
+    margin = decision.get('margin', 50)
+    suggested = suggested_price(team, sales_forecast, margin)
+    team.update({'sales_forecast': sales_forecast, 'profit_margin': margin, 'suggested_price': suggested})
+    settle_pricing(team, decision.get('price') or suggested, sales_fn)
+    start_survival(team)
+    if decision.get('months'):
+        start_campaign(team, decision['months'], rng, config)
+    for month, choice in enumerate(decision.get('choices', [])[:last_month(team)], start=1):
+        event = month_event(team, month)
+        label = option_label(event, choice)
+        if not is_valid_choice(team, event, label):
+            raise ValueError(f"M{month} 對策 {label} 不合法 (第一關選了鮮奶)")
+        apply_loan_shark(team)
+        play_month(team, month, label, rng, sales_fn, config)
+    return team
@@ -0,0 +1,97 @@
+"""第三關的售價試算器：在瀏覽器端拖拉售價，即時更新損益分析圖與損益數字。
+
+價格曲線 (prefetch.price_curve) 只有銷量需要 AI 模型，營收、成本、損益、BEP 都能由
+售價、直接成本與固定成本推得，因此只把銷量陣列與兩個成本打包成一份精簡 JSON 送到瀏覽器，
+其餘在前端計算。拖拉滑桿 (含方向鍵) 完全不經伺服器；按下「帶入此售價」才把售價送回
+(一次 rerun)，填入下方的「決定最終售價」，按下「確認定價」才送出 final_p。
+"""
+import streamlit as st
+
+import prefetch
+
+HTML = """
+<div id="explorer" style="font-family:sans-serif;font-size:14px">
+  <label>試算售價：$<b id="price"></b>
+    <input id="slider" type="range" min="1" step="1" style="width:100%">
+  </label>
+  <div id="readout" style="display:flex;gap:1.5em;margin:6px 0"></div>
+  <button id="pick" type="button">帶入此售價</button>
+  <svg id="chart" width="100%" height="300" viewBox="0 0 640 300" xmlns="http://www.w3.org/2000/svg"></svg>
+</div>
+"""
+
+# components.v2 的 ES module：拖拉 (input) 只在瀏覽器重畫，按下「帶入此售價」才把售價送回 Python
+JS = """
+export default function(component) {
+  const { data: DATA, parentElement: root, setStateValue } = component;
+  const slider = root.querySelector('#slider'), button = root.querySelector('#pick');
+  slider.max = DATA.p0 + DATA.sales.length - 1;
+  if (!slider.dataset.ready) {
+    slider.value = DATA.start;
+    slider.dataset.ready = '1';
+  }
+  const W = 640, H = 300, PAD = 46;
+  const fmt = v => (v < 0 ? '-$' : '$') + Math.abs(Math.round(v)).toLocaleString('en-US');
+
+  function draw() {
+    const price = +slider.value;
+    const sales = DATA.sales[price - DATA.p0];
+    const revenue = price * sales, cost = Math.trunc(DATA.dc * sales + DATA.fc), profit = revenue - cost;
+    const cm = price - DATA.dc, bep = cm > 0 ? DATA.fc / cm : Infinity;
+    root.querySelector('#price').textContent = price;
+    root.querySelector('#readout').innerHTML =
+      `<span>AI 預測銷量 <b>${sales.toLocaleString('en-US')}</b> 杯</span>` +
+      `<span>營收 <b>${fmt(revenue)}</b></span>` +
+      `<span>損益 <b style="color:${profit < 0 ? '#d62728' : '#2ca02c'}">${fmt(profit)}</b></span>` +
+      `<span>BEP <b>${isFinite(bep) ? Math.trunc(bep).toLocaleString('en-US') + ' 杯' : '無法回本'}</b></span>`;
+
+    const maxX = Math.max(5000, isFinite(bep) ? Math.trunc(bep * 1.5) : 0);
+    const maxY = Math.max(price * maxX, DATA.fc + DATA.dc * maxX) || 1;
+    const x = v => PAD + v / maxX * (W - 2 * PAD), y = v => H - PAD - v / maxY * (H - 2 * PAD);
+    const line = (x1, y1, x2, y2, color, dash) =>
+      `<line x1="${x(x1)}" y1="${y(y1)}" x2="${x(x2)}" y2="${y(y2)}" stroke="${color}" stroke-width="2"${dash ? ' stroke-dasharray="6,4"' : ''}/>`;
+    let svg = line(0, 0, maxX, 0, '#999') +
+      line(0, 0, maxX, price * maxX, '#1f77b4') +
+      line(0, DATA.fc, maxX, DATA.fc + DATA.dc * maxX, '#d62728') +
+      `<text x="${W - PAD}" y="${y(price * maxX) - 4}" fill="#1f77b4" font-size="11" text-anchor="end">總收入</text>` +
+      `<text x="${W - PAD}" y="${y(DATA.fc + DATA.dc * maxX) + 14}" fill="#d62728" font-size="11" text-anchor="end">總成本</text>` +
+      `<text x="${PAD}" y="${H - PAD + 16}" font-size="11">0</text>` +
+      `<text x="${W - PAD}" y="${H - PAD + 16}" font-size="11" text-anchor="end">${maxX.toLocaleString('en-US')} 杯</text>`;
+    if (isFinite(bep)) {
+      svg += `<line x1="${x(bep)}" y1="${PAD / 2}" x2="${x(bep)}" y2="${H - PAD}" stroke="#555" stroke-dasharray="6,4"/>` +
+             `<text x="${x(bep) + 4}" y="${PAD / 2 + 10}" font-size="11">BEP</text>`;
+    }
+    if (sales <= maxX) {
+      const py = DATA.fc + DATA.dc * sales;
+      svg += `<circle cx="${x(sales)}" cy="${y(py)}" r="5" fill="#00CC96"></circle>` +
+             `<text x="${x(sales)}" y="${y(py) - 10}" font-size="11" text-anchor="middle">AI預測落點</text>`;
+    }
+    root.querySelector('#chart').innerHTML = svg;
+  }
+
+  const pick = () => setStateValue('price', +slider.value);
+  slider.addEventListener('input', draw);
+  button.addEventListener('click', pick);
+  draw();
+  return () => {
+    slider.removeEventListener('input', draw);
+    button.removeEventListener('click', pick);
+  };
+}
+"""
+
+
+def payload(curve, team, start):
+    """瀏覽器需要的全部資料：銷量陣列 (索引 0 為售價 p0)、直接成本、固定成本"""
+    return {'p0': int(curve['prices'][0]), 'sales': curve['sales'].tolist(),
+            'dc': team['direct_cost'], 'fc': team['total_indirect_cost'],
+            'start': min(max(int(start), 1), prefetch.PRICE_MAX)}
+
+
+def price_explorer(curve, team, start, on_pick=None, key='price_explorer'):
+    """掛載試算器，回傳學生最後一次按「帶入此售價」時的售價 (還沒按過為 None)"""
+    # 每次 rerun 以相同定義註冊，Streamlit 只在定義改變時才會覆蓋
+    component = st.components.v2.component('price_explorer', html=HTML, js=JS)
+    result = component(key=key, data=payload(curve, team, start), default={'price': None},
+                       on_price_change=on_pick or (lambda: None))
+    return result.price
@@ -0,0 +1,132 @@
+"""Session 記憶體管理：把可重算的大型物件 (圖表、價格曲線、預先計算結果) 與隊伍紀錄分開保存。
+
+st.session_state 只留小小的隊伍紀錄 (my_cafe_data)；可重算的物件放在這裡，以 session id
+分組，依最近使用順序 (LRU) 排列：
+
+- 閒置超過 COSTGAME_IDLE_SECONDS (預設 900 秒) 的 session，其物件整組清掉
+- 所有 session 合計超過 COSTGAME_MEMORY_BUDGET_MB (預設 256 MB) 時，從最久沒動的 session 開始清，
+  直到回到預算內；正在 rerun 的 session 不會被清
+
+被清掉的物件在下次用到時由 prefetch.result() 同步重算，遊戲進度不受影響。
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+import metrics
+
+BUDGET_BYTES = int(float(os.environ.get('COSTGAME_MEMORY_BUDGET_MB', '256')) * 1024 * 1024)
+IDLE_SECONDS = float(os.environ.get('COSTGAME_IDLE_SECONDS', '900'))
+
+
+class _Session:
+    __slots__ = ('artifacts', 'sizes', 'last_seen')
+
+    def __init__(self):
+        self.artifacts = {}
+        self.sizes = {}      # key -> bytes，量過就不再量，內容改變時由 invalidate() 清掉
+        self.last_seen = time.time()
+
+    @property
+    def size(self):
+        return sum(self.sizes.values())
+
+
+_lock = threading.Lock()
+_sessions = OrderedDict()   # session id -> _Session，最久沒用的在前面
+_rerunning = set()          # 正在 rerun 的 session (artifacts() 加入，end_rerun() 移除)
+_stats = {'idle_evictions': 0, 'budget_evictions': 0, 'evicted_bytes': 0, 'last_eviction': None}
+
+
+# --- 1. 估算大小 ---
+def sizeof(obj):
+    """估算一個快取物件的大小；Future 量其結果，plotly 圖量其 JSON 結構"""
+    if isinstance(obj, Future):
+        return sizeof(obj.result()) if obj.done() and obj.exception() is None else 0
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if hasattr(obj, 'memory_usage'):           # pandas DataFrame / Series
+        return int(np.sum(obj.memory_usage(deep=True)))
+    if hasattr(obj, 'to_plotly_json'):
+        return metrics.deep_sizeof(obj.to_plotly_json())
+    if isinstance(obj, dict):
+        return metrics.deep_sizeof({}) + sum(sizeof(k) + sizeof(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return metrics.deep_sizeof(type(obj)()) + sum(sizeof(v) for v in obj)
+    if hasattr(obj, '__dict__') and not isinstance(obj, type):   # 例如 charts.HistoryView
+        return metrics.deep_sizeof(obj) + sizeof(vars(obj))
+    return metrics.deep_sizeof(obj)
+
+
+# --- 2. 取用與清除 ---
+def artifacts(session):
+    """該 session 的物件 dict (可直接讀寫)；同時標記為剛使用、正在 rerun"""
+    with _lock:
+        entry = _sessions.get(session)
+        if entry is None:
+            entry = _sessions[session] = _Session()
+        entry.last_seen = time.time()
+        _sessions.move_to_end(session)
+        _rerunning.add(session)
+        return entry.artifacts
+
+
+def invalidate(session, key):
+    """物件內容變大 (例如 HistoryView 新增一列)：rerun 結束時重新量大小"""
+    with _lock:
+        entry = _sessions.get(session)
+        if entry is not None:
+            entry.sizes.pop(key, None)
+
+
+def drop(session):
+    with _lock:
+        _sessions.pop(session, None)
+
+
+def _evict(session, reason):
+    entry = _sessions.pop(session)
+    _rerunning.discard(session)
+    _stats[reason] += 1
+    _stats['evicted_bytes'] += entry.size
+    _stats['last_eviction'] = time.time()
+
+
+def end_rerun(session):
+    """rerun 結束時：量新增物件的大小，再依閒置時間與總預算清除其他 session。
+
+    預算超出時跳過正在 rerun 的 session；rerun 因例外中斷而沒有呼叫 end_rerun 的 session
+    閒置超過 IDLE_SECONDS 後照樣清掉，不會一直被當成正在 rerun。
+    """
+    with _lock:
+        _rerunning.discard(session)
+        entry = _sessions.get(session)
+        pending = [(k, v) for k, v in entry.artifacts.items() if k not in entry.sizes] if entry else []
+    # 量大小不持鎖 (plotly 圖轉 JSON 較慢)
+    measured = {k: sizeof(v) for k, v in pending}
+    with _lock:
+        if entry is not None:
+            # 背景工作還沒算完的 (大小為 0) 下次再量
+            entry.sizes.update({k: n for k, n in measured.items() if n})
+        now = time.time()
+        for sid in [s for s, e in _sessions.items() if s != session and now - e.last_seen > IDLE_SECONDS]:
+            _evict(sid, 'idle_evictions')
+        total = sum(e.size for e in _sessions.values())
+        for sid in list(_sessions):
+            if total <= BUDGET_BYTES:
+                break
+            if sid == session or sid in _rerunning:
+                continue
+            total -= _sessions[sid].size
+            _evict(sid, 'budget_evictions')
+
+
+# --- 3. 統計 ---
+def stats():
+    with _lock:
+        return dict(_stats, sessions=len(_sessions), total_bytes=sum(e.size for e in _sessions.values()),
+                    budget_bytes=BUDGET_BYTES, idle_seconds=IDLE_SECONDS)
@@ -0,0 +1,138 @@
+"""不開畫面直接玩 (或重播) 整批遊戲：讀決策 JSONL，每局一行結果 JSONL，邊算邊輸出。
+
+    python headless.py decisions.jsonl -o results.jsonl
+    python headless.py decisions.jsonl --jobs 8 --ruleset v1141101 > results.jsonl
+    cat decisions.jsonl | python headless.py - --full
+
+決策格式見 engine.py「腳本化的一整局」(含長期經營的 "months")；每局以 decision['seed']
+(沒有則用行號) 建立亂數產生器，同一個檔案重跑結果完全相同。輸出每行為
+{"line": 行號, ...regress.summarize 的欄位}，或 {"line": 行號, "error": "..."}；
+--full 改為輸出完整的 team dict。
+
+只匯入 engine / rulesets，不載入 Streamlit 與 plotly。預設在本行程內逐局計算；
+--jobs N 時輸入分批讀入、每批交給 multiprocessing 的 imap 依序取回。兩種方式的記憶體
+用量都與檔案大小無關，百萬局也不會增長。啟動 worker 行程本身要花時間，幾千局以下用預設即可。
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import random
+import sys
+import time
+
+import regress
+import rulesets
+
+_ruleset = None
+_full = False
+
+
+# --- 1. 單局 ---
+def _init(ruleset, plugins, full):
+    """worker 行程初始化：載入外掛並選定規則版本"""
+    global _ruleset, _full
+    for path in plugins:
+        rulesets.load_plugin(path)
+    _ruleset = rulesets.get_ruleset(ruleset)
+    _full = full
+
+
+def play_line(item):
+    """(行號, 原始一行) -> (一行 JSON 結果, 淨資產)；決策或遊戲本身的錯誤記在該行，淨資產為 None"""
+    line_no, text = item
+    try:
+        decision = json.loads(text)
+        team = _ruleset.play(decision, random.Random(decision.get('seed', line_no)))
+        summary = regress.summarize(team)
+        result, net = (team if _full else summary), summary['net_assets']
+    except (ValueError, KeyError, TypeError, AttributeError, OverflowError, ZeroDivisionError) as e:
+        result, net = {'error': f"{type(e).__name__}: {e}"}, None
+    return json.dumps({'line': line_no, **result}, ensure_ascii=False), net
+
+
+# --- 2. 整批 ---
+def numbered(lines):
+    """(行號, 內容)，行號從 1 起算，略過空白行"""
+    return ((i, text) for i, text in enumerate(lines, start=1) if text.strip())
+
+
+def run(lines, ruleset='current', jobs=1, chunksize=64, plugins=(), full=False):
+    """依輸入順序逐局產生 (JSON 字串, 淨資產)；jobs > 1 時以多個行程平行計算"""
+    items = numbered(lines)
+    if jobs <= 1:
+        _init(ruleset, plugins, full)
+        yield from map(play_line, items)
+        return
+    # imap 會把輸入一口氣讀完排進佇列，所以分批送入，每批最多 jobs * chunksize * 4 局
+    batch = jobs * chunksize * 4
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(jobs, initializer=_init, initargs=(ruleset, list(plugins), full)) as pool:
+        while True:
+            chunk = list(itertools.islice(items, batch))
+            if not chunk:
+                break
+            yield from pool.imap(play_line, chunk, chunksize)
+
+
+class Tally:
+    """串流統計：只留計數與總和，不保存每局結果"""
+
+    def __init__(self):
+        self.games = self.errors = self.bankrupt = 0
+        self.net_total = 0
+
+    def add(self, net):
+        self.games += 1
+        if net is None:
+            self.errors += 1
+            return
+        self.bankrupt += net <= 0
+        self.net_total += net
+
+    def summary(self):
+        played = self.games - self.errors
+        return {'games': self.games, 'errors': self.errors,
+                'bankrupt_rate': self.bankrupt / played if played else None,
+                'mean_net_assets': self.net_total / played if played else None}
+
+
+# --- 3. 命令列 ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('decisions', help="決策 JSONL 檔，'-' 為標準輸入")
+    parser.add_argument('-o', '--output', help='結果 JSONL 檔 (預設標準輸出)')
+    parser.add_argument('--ruleset', default='current', help='規則版本 (見 regress.py --list)')
+    parser.add_argument('--plugin', action='append', default=[], help='載入外掛規則檔 (可重複)')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='平行的行程數 (預設 1；啟動 worker 行程需要時間，大檔案再加大)')
+    parser.add_argument('--chunksize', type=int, default=64, help='每次交給一個行程的局數')
+    parser.add_argument('--full', action='store_true', help='輸出完整的 team dict 而非摘要')
+    args = parser.parse_args(argv)
+
+    for path in args.plugin:
+        rulesets.load_plugin(path)
+    rulesets.get_ruleset(args.ruleset)   # 名稱打錯時在開 worker 前就報錯
+
+    src = sys.stdin if args.decisions == '-' else open(args.decisions, encoding='utf-8')
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    tally, start = Tally(), time.perf_counter()
+    try:
+        for text, net in run(src, args.ruleset, args.jobs, args.chunksize, args.plugin, args.full):
+            out.write(text + '\n')
+            tally.add(net)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    stats = tally.summary()
+    print(f"{stats['games']:,} 局   {stats['games'] / elapsed if elapsed else 0:,.0f} 局/秒   "
+          f"破產率 {stats['bankrupt_rate'] or 0:.1%}   淨資產平均 {stats['mean_net_assets'] or 0:,.0f}   "
+          f"錯誤 {stats['errors']}", file=sys.stderr)
+    return 1 if stats['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
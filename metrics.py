@@ -0,0 +1,204 @@
+"""costgame 效能量測：每次 rerun 的計時、各關卡區塊耗時與 session 狀態大小。
+
+預設關閉。設定環境變數 COSTGAME_METRICS=1 才會啟用；關閉時 span() 回傳共用的
+空 context manager、timed() 直接回傳原函式，幾乎沒有額外負擔。
+
+所有數據都在同一個 Python 行程內彙整 (Streamlit 的各 session 共用一個行程)，
+可由老師面板讀取 snapshot()，或輸出成 Prometheus 文字格式檔案。
+"""
+import bisect
+import contextlib
+import functools
+import os
+import sys
+import threading
+import time
+
+ENABLED = os.environ.get('COSTGAME_METRICS', '') not in ('', '0')
+PROM_FILE = os.environ.get('COSTGAME_METRICS_FILE', 'costgame_metrics.prom')
+PROM_INTERVAL = float(os.environ.get('COSTGAME_METRICS_INTERVAL', '5'))
+GAUGE_TTL = 3600  # 超過一小時沒更新的 session 量測值就丟掉
+
+# 直方圖分界：計時 (秒) 與狀態大小 (bytes)
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+# --- 1. 直方圖 ---
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最後一格是 +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        """以分界上緣估計分位數 (與 Prometheus histogram_quantile 同樣粗略)"""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float('inf')
+        return float('inf')
+
+
+_lock = threading.Lock()
+_histograms = {}     # name -> Histogram
+_gauges = {}         # (name, session) -> (value, 更新時間)
+_local = threading.local()
+_last_export = 0.0
+
+
+def observe(name, value, buckets=TIME_BUCKETS):
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = Histogram(buckets)
+        hist.observe(value)
+
+
+def set_gauge(name, session, value):
+    with _lock:
+        _gauges[(name, session)] = (value, time.time())
+
+
+# --- 2. 計時區段 ---
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        # st.rerun()/st.stop() 以例外中斷腳本，仍要記錄已花的時間
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def span(name):
+    return _Span(name) if ENABLED else _NULL_SPAN
+
+
+def timed(name):
+    """函式計時裝飾器；未啟用時原封不動回傳原函式"""
+    def wrap(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+        return inner
+    return wrap
+
+
+def start_rerun():
+    if ENABLED:
+        _local.rerun_start = time.perf_counter()
+
+
+def end_rerun():
+    """在腳本正常結束、或 rerun()/stop 之前呼叫"""
+    if not ENABLED:
+        return
+    start = getattr(_local, 'rerun_start', None)
+    if start is None:
+        return
+    _local.rerun_start = None
+    observe('rerun', time.perf_counter() - start)
+    global _last_export
+    now = time.time()
+    if PROM_FILE and now - _last_export >= PROM_INTERVAL:
+        _last_export = now
+        write_prometheus(PROM_FILE)
+
+
+# --- 3. Session 狀態大小 ---
+def deep_sizeof(obj, _seen=None):
+    """遞迴估算容器佔用的記憶體 (bytes)"""
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(v, seen) for v in obj)
+    return size
+
+
+def record_state_size(session, data):
+    if not ENABLED:
+        return
+    size = deep_sizeof(data)
+    set_gauge('session_state_bytes', session, size)
+    observe('session_state_bytes', size, SIZE_BUCKETS)
+
+
+# --- 4. 輸出 ---
+def snapshot():
+    """給老師面板用的摘要：每個量測項目的次數、平均、p50、p95"""
+    with _lock:
+        rows = [{'項目': name, '次數': h.count, '平均': h.total / h.count if h.count else 0.0,
+                 'p50': h.quantile(0.5), 'p95': h.quantile(0.95)}
+                for name, h in sorted(_histograms.items())]
+        now = time.time()
+        sizes = {s: v for (n, s), (v, t) in _gauges.items()
+                 if n == 'session_state_bytes' and now - t < GAUGE_TTL}
+    return rows, sizes
+
+
+def _prom_name(name):
+    return 'costgame_' + name.replace('.', '_').replace('-', '_')
+
+
+def render_prometheus():
+    lines = []
+    now = time.time()
+    with _lock:
+        for stale in [k for k, (_, t) in _gauges.items() if now - t >= GAUGE_TTL]:
+            del _gauges[stale]
+        for name, h in sorted(_histograms.items()):
+            metric = _prom_name(name) + ('' if name == 'session_state_bytes' else '_seconds')
+            lines.append(f'# TYPE {metric} histogram')
+            cumulative = 0
+            for bound, c in zip(h.buckets + (float('inf'),), h.counts):
+                cumulative += c
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+            lines.append(f'{metric}_sum {h.total!r}')
+            lines.append(f'{metric}_count {h.count}')
+        names = sorted({n for n, _ in _gauges})
+        for name in names:
+            metric = _prom_name(name) + '_current'
+            lines.append(f'# TYPE {metric} gauge')
+            for (n, session), (v, _) in sorted(_gauges.items()):
+                if n == name:
+                    lines.append(f'{metric}{{session="{session}"}} {v}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(path=PROM_FILE):
+    """先寫暫存檔再 rename，讓 node_exporter textfile collector 不會讀到半個檔案"""
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
@@ -0,0 +1,179 @@
+"""背景預先計算：第二關送出後，第三、四關要顯示的結果就已經確定了。
+
+- 第二關送出 → 算價格曲線 (每個售價的銷量、營收、成本、損益、BEP)
+- 第三關試算出建議售價 → 以建議售價預先算好試營運結果、損益分析圖與 M1~M3 各對策結果
+- 「與 AI 對決」與生存戰各月直接取用結果；沒有預先算到 (例如改了售價) 才同步計算
+
+工作在有上限的 thread pool 中執行 (COSTGAME_PREFETCH_WORKERS，預設 2)，
+排隊中的工作超過 COSTGAME_PREFETCH_QUEUE (預設 64) 時不再預先計算，改為用到時才算。
+結果以 Future 存在每個 session 的快取 dict 中，key 含前兩關設定，設定一改就不會誤用。
+啟用 state_backend 時，算好的結果也寫入共用的 SQLite，其他 worker 遇到相同設定直接讀取；
+超過 COSTGAME_PREFETCH_TTL 秒 (預設 86400，一天) 的結果每小時清除一次，資料庫不會隨上課次數增長。
+"""
+import copy
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+import charts
+import engine
+import metrics
+import state_backend
+
+WORKERS = int(os.environ.get('COSTGAME_PREFETCH_WORKERS', '2'))
+MAX_PENDING = int(os.environ.get('COSTGAME_PREFETCH_QUEUE', '64'))
+PRICE_MAX = 1000  # 價格曲線涵蓋 $1 ~ $1000
+SHARED_TTL = float(os.environ.get('COSTGAME_PREFETCH_TTL', '86400'))
+PURGE_INTERVAL = 3600
+
+SETUP_KEYS = ('style', 'bean', 'milk', 'direct_cost', 'estimated_indirect', 'total_indirect_cost')
+SETTLED_KEYS = ('final_price', 'ai_predicted_sales', 'actual_profit', 's3_revenue', 's3_cost', 'bep')
+
+_pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='costgame-prefetch')
+_slots = threading.BoundedSemaphore(MAX_PENDING)
+_purge = {'lock': threading.Lock(), 'last': 0.0}
+
+
+# --- 1. 計算工作 (在背景 thread 執行，只讀取 setup 副本) ---
+def setup_of(team):
+    return {k: copy.deepcopy(team[k]) for k in SETUP_KEYS}
+
+
+def setup_key(setup):
+    return (setup['style'], setup['milk'], setup['direct_cost'], setup['total_indirect_cost'],
+            setup['estimated_indirect']['行銷'])
+
+
+@metrics.timed('prefetch.price_curve')
+def price_curve(setup):
+    prices = np.arange(1, PRICE_MAX + 1)
+    mkt = setup['estimated_indirect']['行銷']
+    with metrics.span('predict_sales.batch'):
+        sales = engine.predict_sales_batch(np.full(PRICE_MAX, setup['style']), prices, np.full(PRICE_MAX, mkt))
+    dc, fc = setup['direct_cost'], setup['total_indirect_cost']
+    revenue = prices * sales
+    cost = dc * sales + fc
+    margin = prices - dc
+    bep = np.where(margin > 0, fc / np.maximum(margin, 1), np.inf)
+    return {'style': setup['style'], 'mkt': mkt, 'prices': prices, 'sales': sales,
+            'revenue': revenue, 'cost': cost, 'profit': revenue - cost, 'bep': bep}
+
+
+def curve_sales_fn(curve):
+    """以價格曲線查表取代 predict_sales；曲線範圍外或不同店型/行銷費時照常計算"""
+    sales = curve['sales']
+
+    def lookup(style_key, price, marketing_budget):
+        if (style_key == curve['style'] and marketing_budget == curve['mkt']
+                and price == int(price) and 1 <= price <= PRICE_MAX):
+            return int(sales[int(price) - 1])
+        return engine.predict_sales(style_key, price, marketing_budget)
+    return lookup
+
+
+@metrics.timed('prefetch.price_bundle')
+def price_bundle(setup, price, curve=None):
+    """某個售價下第三、四關需要的一切：試營運結果、損益分析圖、M1~M3 結果表"""
+    team = copy.deepcopy(setup)
+    # 畫面上的銷量預測全部在這裡發生 (定價、M1 通膨)，計時也放在這裡
+    sales_fn = metrics.timed('predict_sales')(curve_sales_fn(curve) if curve is not None else engine.predict_sales)
+    engine.settle_pricing(team, price, sales_fn)
+    with metrics.span('chart.breakeven'):
+        fig = charts.build_breakeven_chart(team)
+    return {'settled': {k: team[k] for k in SETTLED_KEYS}, 'chart': fig,
+            'outcomes': engine.outcome_table(team, sales_fn)}
+
+
+# --- 2. 快取與排程 ---
+def _shared_get(key):
+    return state_backend.get_pickle('prefetch', repr(key)) if state_backend.ENABLED else None
+
+
+def _compute(key, fn, args):
+    value = fn(*args)
+    if state_backend.ENABLED:
+        state_backend.put_pickle('prefetch', repr(key), value)
+        purge_shared()
+    return value
+
+
+def purge_shared(force=False):
+    """清除共用資料庫中過期的預先計算結果 (每個 worker 每 PURGE_INTERVAL 秒最多一次)，回傳刪除筆數"""
+    with _purge['lock']:
+        now = time.time()
+        if not force and now - _purge['last'] < PURGE_INTERVAL:
+            return 0
+        _purge['last'] = now
+    return state_backend.purge('prefetch', SHARED_TTL)
+
+
+def _done(value):
+    fut = Future()
+    fut.set_result(value)
+    return fut
+
+
+def _run(key, fn, args):
+    try:
+        return _compute(key, fn, args)
+    finally:
+        _slots.release()
+
+
+def schedule(cache, key, fn, *args):
+    """排入背景計算；已在快取中或佇列已滿時不做事"""
+    if key in cache:
+        return
+    shared = _shared_get(key)
+    if shared is not None:
+        cache[key] = _done(shared)
+    elif _slots.acquire(blocking=False):
+        cache[key] = _pool.submit(_run, key, fn, args)
+
+
+def peek(cache, key):
+    fut = cache.get(key)
+    if fut is not None and fut.done() and fut.exception() is None:
+        return fut.result()
+    return None
+
+
+def result(cache, key, fn, *args):
+    """取結果：背景還在算就等它，其他 worker 算過就讀取，都沒有才當場算"""
+    fut = cache.get(key)
+    if fut is None:
+        shared = _shared_get(key)
+        fut = cache[key] = _done(shared if shared is not None else _compute(key, fn, args))
+    return fut.result()
+
+
+# --- 3. 畫面使用的入口 ---
+def curve_key(team):
+    return ('curve',) + setup_key(team)
+
+
+def bundle_key(team, price):
+    return ('price',) + setup_key(team) + (price,)
+
+
+def prefetch_curve(cache, team):
+    schedule(cache, curve_key(team), price_curve, setup_of(team))
+
+
+def get_curve(cache, team):
+    return result(cache, curve_key(team), price_curve, setup_of(team))
+
+
+def _bundle_job(cache, setup, price):
+    return price_bundle(setup, price, peek(cache, curve_key(setup)))
+
+
+def prefetch_price(cache, team, price):
+    schedule(cache, bundle_key(team, price), _bundle_job, cache, setup_of(team), price)
+
+
+def get_bundle(cache, team, price):
+    return result(cache, bundle_key(team, price), _bundle_job, cache, setup_of(team), price)
@@ -0,0 +1,215 @@
+"""逐次 rerun 的 cProfile 側錄 (除錯用，預設關閉)。
+
+啟用方式：
+    COSTGAME_PROFILE=1 streamlit run costgame.py    # 所有 session
+    http://.../?instructor=<金鑰>&profile=1         # 只側錄這個 session (限老師)
+
+每次被側錄的 rerun 會在 COSTGAME_PROFILE_DIR (預設 profiles/) 寫出：
+    <id>.collapsed  flamegraph.pl / speedscope 可讀的 collapsed stack
+    <id>.txt        每個關卡 (stage) 的 top-N 函式摘要
+    <id>.prof       整次 rerun 的 pstats 原始檔 (snakeviz 可開)
+只保留最近 COSTGAME_PROFILE_KEEP 次 (預設 50)，較舊的檔案會自動刪除，
+因此上課時可以一直開著。
+"""
+import collections
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from pathlib import Path
+
+ENV_ENABLED = os.environ.get('COSTGAME_PROFILE', '') not in ('', '0')
+PROFILE_DIR = Path(os.environ.get('COSTGAME_PROFILE_DIR', 'profiles'))
+KEEP = int(os.environ.get('COSTGAME_PROFILE_KEEP', '50'))
+TOP_N = int(os.environ.get('COSTGAME_PROFILE_TOP', '15'))
+PAGE = 'page'  # 不在任何關卡區塊內的程式碼
+
+# Python 3.12 起 cProfile 改用 sys.monitoring，同一時間只能有一個 profiler，
+# 因此一次只側錄一個 session；搶不到的 rerun 直接略過。
+# 側錄中的 rerun 記在模組層級 (而非 thread-local)：Streamlit 每次 rerun 可能換一條
+# script thread，中斷的 rerun 留下的側錄要能被下一條 thread 找到並釋放 _busy。
+_busy = threading.Lock()
+_active = {'run': None}
+_ring_lock = threading.Lock()
+_ring = collections.deque()
+_seq = 0
+
+
+class _Run:
+    def __init__(self, session):
+        self.session = session
+        self.thread = threading.current_thread()
+        self.started = time.time()
+        self.profiles = {PAGE: cProfile.Profile()}
+        self.current = self.profiles[PAGE]
+        self.closed = False
+        self.current.enable()
+
+    def switch(self, name):
+        # rerun() 在關卡區塊內就結束側錄，之後區塊的 __exit__ 不可再啟用 profiler
+        if self.closed:
+            return
+        self.current.disable()
+        self.current = self.profiles.setdefault(name, cProfile.Profile())
+        self.current.enable()
+
+
+class _Stage:
+    __slots__ = ('run', 'name', 'outer')
+
+    def __init__(self, run, name):
+        self.run, self.name = run, name
+
+    def __enter__(self):
+        self.outer = next(k for k, v in self.run.profiles.items() if v is self.run.current)
+        self.run.switch(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        self.run.switch(self.outer)
+        return False
+
+
+class _NullStage:
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def start_rerun(session, requested=False):
+    """在腳本開頭呼叫；requested 為此 session 是否要求側錄 (?profile=1，限老師)"""
+    _discard(session)
+    if not (ENV_ENABLED or requested) or not _busy.acquire(blocking=False):
+        return
+    _active['run'] = _Run(session)
+
+
+def _own_run():
+    # 只有開始側錄的那條 thread 能切換關卡或結束側錄
+    run = _active['run']
+    return run if run is not None and run.thread is threading.current_thread() else None
+
+
+def stage(name):
+    run = _own_run()
+    return _Stage(run, name) if run is not None else _NULL_STAGE
+
+
+def _close(run):
+    with _ring_lock:
+        if _active['run'] is not run:
+            return False
+        _active['run'] = None
+    run.closed = True
+    run.current.disable()
+    _busy.release()
+    return True
+
+
+def end_rerun():
+    run = _own_run()
+    if run is not None and _close(run):
+        _save(run)
+
+
+def _discard(session):
+    # 上一次 rerun 因例外、StopException 等中斷而沒有 end_rerun()：
+    # 同一個 session 的新 rerun，或側錄的 thread 已結束時，丟棄並釋放鎖
+    run = _active['run']
+    if run is not None and (run.session == session or not run.thread.is_alive()):
+        _close(run)
+
+
+# --- 輸出 ---
+def _label(func):
+    filename, line, name = func
+    if filename == '~':  # 內建函式，例如 <built-in method time.sleep>
+        return name
+    return f"{name} ({Path(filename).name}:{line})"
+
+
+def collapsed_stacks(stats, prefix='', max_depth=60, min_fraction=0.001, max_nodes=20000):
+    """由 pstats 的呼叫圖展開成 collapsed stack (與 flameprof 相同的近似法)。
+
+    cProfile 只記錄 caller -> callee 的邊，沒有完整堆疊；這裡把每個 callee 的自身時間
+    依各條邊佔它總時間的比例分攤到呼叫者的堆疊下，得到近似的火焰圖。
+    分攤後不到總時間 min_fraction 的分支直接捨去，展開的節點數也有上限，
+    避免呼叫圖路徑數爆炸 (plotly 建圖一次就有上千個函式)。
+    回傳 {stack 字串: 微秒}。
+    """
+    raw = stats.stats  # func -> (cc, nc, tt, ct, callers)
+    callees = collections.defaultdict(list)
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees[caller].append((func, edge[3]))
+    roots = [func for func, v in raw.items() if not v[4]]
+    min_ct = sum(raw[f][3] for f in roots) * min_fraction
+    out = collections.Counter()
+    budget = [max_nodes]
+
+    def walk(func, stack, on_stack, scale, depth):
+        tt, ct = raw[func][2], raw[func][3]
+        stack = f"{stack};{_label(func)}" if stack else _label(func)
+        budget[0] -= 1
+        expand = depth < max_depth and budget[0] > 0
+        children = [(c, scale * e / raw[c][3]) for c, e in callees.get(func, ())
+                    if raw[c][3] > 0 and c not in on_stack] if expand else []
+        children = [(c, s) for c, s in children if raw[c][3] * s >= min_ct]
+        # 被捨去的子呼叫時間併入自身，總時間才會對得上
+        self_time = ct * scale - sum(raw[c][3] * s for c, s in children)
+        out[stack] += max(self_time, tt * scale) * 1e6
+        on_stack.add(func)
+        for child, child_scale in children:
+            walk(child, stack, on_stack, child_scale, depth + 1)
+        on_stack.discard(func)
+
+    for func in roots:
+        walk(func, prefix, set(), 1.0, 0)
+    return out
+
+
+def summarize(name, stats):
+    buf = io.StringIO()
+    stats.stream = buf
+    stats.sort_stats('cumulative').print_stats(TOP_N)
+    return f"===== {name} =====\n{buf.getvalue()}"
+
+
+def _save(run):
+    global _seq
+    with _ring_lock:
+        _seq += 1
+        session = ''.join(c for c in run.session if c.isalnum())[:8]
+        stem = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(run.started))}-{session}-{_seq:05d}"
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    merged, stacks, summaries = None, collections.Counter(), []
+    for name, prof in run.profiles.items():
+        stats = pstats.Stats(prof)
+        if not stats.stats:
+            continue
+        stacks.update(collapsed_stacks(stats, prefix=name))
+        summaries.append(summarize(name, stats))
+        if merged is None:
+            merged = pstats.Stats(prof)
+        else:
+            merged.add(prof)
+    if merged is None:
+        return
+    paths = [PROFILE_DIR / f"{stem}{ext}" for ext in ('.collapsed', '.txt', '.prof')]
+    paths[0].write_text(''.join(f"{s} {int(us)}\n" for s, us in stacks.items() if us >= 1), encoding='utf-8')
+    paths[1].write_text('\n'.join(summaries), encoding='utf-8')
+    merged.dump_stats(paths[2])
+    _remember(paths)
+
+
+def _remember(paths):
+    with _ring_lock:
+        _ring.append(paths)
+        evicted = [_ring.popleft() for _ in range(max(0, len(_ring) - KEEP))]
+    for old in evicted:
+        for p in old:
+            p.unlink(missing_ok=True)
@@ -0,0 +1,48 @@
+"""每隊遊戲紀錄的保存與讀取。
+
+畫面每結算一個月 (M0~M3) 就把整份 team_data 覆寫存檔，課後可用
+report_export.py 批次產生戰報。存放位置由 COSTGAME_RECORD_DIR 決定 (預設 records/)。
+"""
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+RECORD_DIR = Path(os.environ.get('COSTGAME_RECORD_DIR', 'records'))
+
+
+def record_path(team_name, session, record_dir=None):
+    # 檔名只留中英數字，再加上隊伍代碼 (多 worker 模式為網址上的 ?team=，否則為 session id)
+    # 前綴避免同名隊伍互相覆蓋；換 worker 接續的隊伍代碼不變，仍寫入同一個檔案
+    safe = re.sub(r'[^\w]+', '_', team_name).strip('_') or 'team'
+    sid = re.sub(r'[^\w]+', '', session)[:8]
+    return Path(record_dir or RECORD_DIR) / f"{safe}-{sid}.json"
+
+
+def save_team_record(team_name, session, team_data, record_dir=None):
+    path = record_path(team_name, session, record_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    record = {'team': team_name, 'session': session, 'saved_at': time.time(), 'data': team_data}
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(record, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp, path)
+    return path
+
+
+def delete_team_record(team_name, session, record_dir=None):
+    # 重新開始遊戲時刪掉舊紀錄，同一隊不會在全班總結裡出現兩次
+    record_path(team_name, session, record_dir).unlink(missing_ok=True)
+
+
+def load_team_record(path):
+    return json.loads(Path(path).read_text(encoding='utf-8'))
+
+
+def list_record_paths(record_dir=None):
+    return sorted(Path(record_dir or RECORD_DIR).glob('*.json'))
+
+
+def load_team_records(record_dir=None):
+    for path in list_record_paths(record_dir):
+        yield load_team_record(path)
@@ -0,0 +1,134 @@
+"""跨規則版本的回歸比較：以同一批決策重播兩個版本，回報結果差異與各版本吞吐量。
+
+    python regress.py current v1141101 --generate 5000
+    python regress.py current cheap-a --plugin my_rules.py --corpus decisions.jsonl
+    python regress.py --list
+
+決策格式見 engine.py「腳本化的一整局」；每局以 decision['seed'] (沒有則用行號)
+建立亂數產生器，兩個版本看到的亂數序列完全相同。
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+import engine
+import rulesets
+
+FIELDS = ['ai_sales', 'final_capital', 'debt', 'net_assets', 'profits', 'events']
+
+
+def generate_corpus(n, seed=0):
+    """隨機產生 n 局合法決策 (售價高於直接成本、有加鮮奶就不會在 M1 選 C)"""
+    rng = random.Random(seed)
+    cfg = engine.GAME_CONFIG
+    corpus = []
+    for i in range(n):
+        bean, milk = rng.choice(list(cfg['beans'])), rng.choice(list(cfg['milks']))
+        choices = [rng.choice('AB' if milk == '一般鮮乳' else 'ABC'), rng.choice('ABC'), rng.choice('ABC')]
+        corpus.append({'style': rng.choice(list(cfg['styles'])), 'bean': bean, 'milk': milk,
+                       'staff': rng.randrange(0, 60001, 5000), 'op': rng.randrange(0, 20001, 1000),
+                       'mkt': rng.randrange(0, 30001, 1000), 'sales_forecast': rng.randrange(100, 3001, 100),
+                       'margin': rng.randrange(0, 201, 10),
+                       'price': rng.randint(engine.direct_cost(bean, milk) + 1, 250) if rng.random() < 0.5 else None,
+                       'choices': choices, 'seed': i})
+    return corpus
+
+
+def read_corpus(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(team):
+    history = team['history']
+    return {'ai_sales': team['ai_predicted_sales'], 'final_capital': team['capital'], 'debt': team['debt'],
+            'net_assets': team['capital'] - team['debt'], 'profits': [h['Profit'] for h in history],
+            'events': [h['Event'] for h in history]}
+
+
+def replay(ruleset, corpus):
+    """回傳 (每局摘要或錯誤訊息, 耗時秒數)"""
+    results = []
+    start = time.perf_counter()
+    for i, decision in enumerate(corpus):
+        try:
+            team = ruleset.play(decision, random.Random(decision.get('seed', i)))
+            results.append(summarize(team))
+        except (ValueError, KeyError, OverflowError, ZeroDivisionError) as e:
+            results.append({'error': f"{type(e).__name__}: {e}"})
+    return results, time.perf_counter() - start
+
+
+def compare(a, b):
+    report = {'games': len(a), 'differing_games': 0, 'field_diffs': dict.fromkeys(FIELDS + ['error'], 0),
+              'net_assets_delta': {}, 'examples': []}
+    deltas = []
+    for i, (ra, rb) in enumerate(zip(a, b)):
+        diff = [f for f in FIELDS + ['error'] if ra.get(f) != rb.get(f)]
+        if not diff:
+            continue
+        report['differing_games'] += 1
+        for f in diff:
+            report['field_diffs'][f] += 1
+        if 'net_assets' in ra and 'net_assets' in rb:
+            deltas.append(rb['net_assets'] - ra['net_assets'])
+        if len(report['examples']) < 10:
+            report['examples'].append({'game': i, 'fields': diff, 'a': ra, 'b': rb})
+    if deltas:
+        report['net_assets_delta'] = {'mean': statistics.fmean(deltas), 'min': min(deltas), 'max': max(deltas)}
+    return report
+
+
+def outcome_stats(results):
+    net = [r['net_assets'] for r in results if 'net_assets' in r]
+    return {'errors': len(results) - len(net),
+            'bankrupt_rate': sum(1 for v in net if v <= 0) / len(net) if net else None,
+            'median_net_assets': statistics.median(net) if net else None}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('versions', nargs='*', help='要比較的兩個規則版本')
+    parser.add_argument('--corpus', help='決策 JSONL 檔')
+    parser.add_argument('--generate', type=int, default=1000, help='未指定 --corpus 時隨機產生的局數')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--plugin', action='append', default=[], help='載入外掛規則檔 (可重複)')
+    parser.add_argument('--output', help='把完整報告寫成 JSON')
+    parser.add_argument('--list', action='store_true', help='列出已註冊的規則版本')
+    args = parser.parse_args(argv)
+
+    for path in args.plugin:
+        rulesets.load_plugin(path)
+    if args.list or len(args.versions) != 2:
+        for name, rs in sorted(rulesets.RULESETS.items()):
+            print(f"{name:<12} {rs.description}")
+        return 0 if args.list else 2
+
+    corpus = read_corpus(args.corpus) if args.corpus else generate_corpus(args.generate, args.seed)
+    runs = []   # 依位置保存，同一個版本跑兩次 (current current) 也能比較
+    for name in args.versions:
+        results, elapsed = replay(rulesets.get_ruleset(name), corpus)
+        runs.append(results)
+        stats = outcome_stats(results)
+        print(f"{name:<12} {len(corpus) / elapsed:10,.0f} 局/秒   破產率 {stats['bankrupt_rate'] or 0:.1%}   "
+              f"淨資產中位數 {stats['median_net_assets'] or 0:,.0f}   錯誤 {stats['errors']}")
+    report = compare(*runs)
+    print(f"\n{report['differing_games']} / {report['games']} 局結果不同")
+    for field, n in report['field_diffs'].items():
+        if n:
+            print(f"  {field:<14} {n}")
+    if report['net_assets_delta']:
+        d = report['net_assets_delta']
+        print(f"  淨資產差 (後者-前者)：平均 {d['mean']:,.0f}，範圍 {d['min']:,} ~ {d['max']:,}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'versions': args.versions, 'report': report,
+                       'stats': [outcome_stats(r) for r in runs]}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
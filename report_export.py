@@ -0,0 +1,204 @@
+"""課後批次匯出：每隊一份 HTML 戰報 + 全班總結。
+
+    python report_export.py                          # 讀 records/，輸出到 reports/
+    python report_export.py --records R --out O --workers 8
+
+每隊的渲染在 process pool 中進行，各 worker 只在啟動時編譯一次共用樣板；
+資金折線圖直接輸出成內嵌 SVG，不經 plotly，300 隊只需數秒。
+"""
+import argparse
+import collections
+import html
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from string import Template
+
+import engine
+import records
+
+DEFAULT_OUT = 'reports'
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="zh-Hant"><head><meta charset="utf-8"><title>$title</title>
+<style>
+body { font-family: sans-serif; max-width: 960px; margin: 2em auto; color: #262730; }
+table { border-collapse: collapse; width: 100%; margin: 1em 0; }
+th, td { border: 1px solid #ddd; padding: 4px 8px; text-align: right; }
+th { background: #f0f2f6; } td.text { text-align: left; }
+.ok { color: #09ab3b; } .bad { color: #ff2b2b; }
+</style></head><body>
+$body
+</body></html>
+"""
+
+TEAM_TEMPLATE = """<h1>☕ $team</h1>
+<p>店型：$style　售價：$$$price　每杯直接成本：$$$direct_cost　每月固定成本：$$$fixed_cost</p>
+<h2 class="$status_class">$status</h2>
+<h3>$chart_title</h3>
+$chart
+<h3>📋 最終營運戰報</h3>
+<table><tr><th>Month</th><th>Sales</th><th>Revenue</th><th>Cost</th><th>Profit</th><th>Capital</th><th>Event</th></tr>
+$rows
+</table>
+$debt_note
+"""
+
+SUMMARY_TEMPLATE = """<h1>📊 全班總結</h1>
+<p>隊伍數：$teams　完賽：$finished　破產率 (淨資產 ≤ 0)：$bankrupt_rate　淨資產中位數：$$$median</p>
+<h3>淨資產分布</h3>
+$histogram
+<h3>各事件對策選擇次數</h3>
+<table><tr><th>事件</th><th>A</th><th>B</th><th>C</th></tr>
+$choice_rows
+</table>
+<h3>各隊戰報</h3>
+<table><tr><th>隊伍</th><th>店型</th><th>淨資產</th><th>負債</th></tr>
+$team_rows
+</table>
+"""
+
+_templates = None
+
+
+def _init_worker():
+    # 每個 worker 只編譯一次樣板
+    global _templates
+    _templates = {'page': Template(PAGE_TEMPLATE), 'team': Template(TEAM_TEMPLATE)}
+
+
+# --- 1. 小工具 ---
+def money(x):
+    return f"-${abs(x):,}" if x < 0 else f"${x:,}"
+
+
+def svg_line_chart(labels, values, width=640, height=240, pad=40):
+    """資金折線圖 (含破產線)，輸出內嵌 SVG"""
+    if not values:
+        return ''
+    lo, hi = min(min(values), 0), max(max(values), 0)
+    span = (hi - lo) or 1
+    step = (width - 2 * pad) / max(1, len(values) - 1)
+    xs = [pad + i * step for i in range(len(values))]
+    ys = [height - pad - (v - lo) / span * (height - 2 * pad) for v in values]
+    zero_y = height - pad - (0 - lo) / span * (height - 2 * pad)
+    points = ' '.join(f"{x:.1f},{y:.1f}" for x, y in zip(xs, ys))
+    parts = [f'<svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg">',
+             f'<line x1="{pad}" y1="{zero_y:.1f}" x2="{width - pad}" y2="{zero_y:.1f}" stroke="red" stroke-dasharray="6,4"/>',
+             f'<text x="{width - pad}" y="{zero_y - 4:.1f}" font-size="11" fill="red" text-anchor="end">破產線</text>',
+             f'<polyline points="{points}" fill="none" stroke="#1f77b4" stroke-width="2"/>']
+    for x, y, label, v in zip(xs, ys, labels, values):
+        parts.append(f'<circle cx="{x:.1f}" cy="{y:.1f}" r="4" fill="#1f77b4"><title>{html.escape(label)}: {money(v)}</title></circle>')
+        parts.append(f'<text x="{x:.1f}" y="{height - pad + 16}" font-size="11" text-anchor="middle">{html.escape(label)}</text>')
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+def svg_histogram(values, bins=12, width=640, height=220, pad=30):
+    if not values:
+        return '<p>尚無資料</p>'
+    lo, hi = min(values), max(values)
+    size = (hi - lo) / bins or 1
+    counts = [0] * bins
+    for v in values:
+        counts[min(bins - 1, int((v - lo) / size))] += 1
+    bar_w = (width - 2 * pad) / bins
+    top = max(counts)
+    parts = [f'<svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg">']
+    for i, c in enumerate(counts):
+        h = c / top * (height - 2 * pad)
+        left = lo + i * size
+        color = '#d62728' if left + size <= 0 else '#1f77b4'
+        parts.append(f'<rect x="{pad + i * bar_w:.1f}" y="{height - pad - h:.1f}" width="{bar_w - 2:.1f}" height="{h:.1f}" fill="{color}">'
+                     f'<title>{money(int(left))} ~ {money(int(left + size))}：{c} 隊</title></rect>')
+    parts.append(f'<text x="{pad}" y="{height - 8}" font-size="11">{money(int(lo))}</text>')
+    parts.append(f'<text x="{width - pad}" y="{height - 8}" font-size="11" text-anchor="end">{money(int(hi))}</text>')
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+# --- 2. 單隊戰報 (在 worker 中執行) ---
+def render_team(path, out_dir):
+    record = records.load_team_record(path)
+    team, data = record['team'], record['data']
+    history = data.get('history', [])
+    capital, debt = data.get('capital', 0), data.get('debt', 0)
+    net_assets = capital - debt
+    finished = engine.is_finished(data)
+    if not finished:
+        status, status_class = f"尚未完賽 (進行到 M{data.get('s4_month', 0)})", ''
+    elif net_assets > 0:
+        status, status_class = f"🎉 恭喜完賽！最終淨資產為 {money(net_assets)}", 'ok'
+    else:
+        status, status_class = f"💀 資不抵債，淨資產為 {money(net_assets)}", 'bad'
+    rows = '\n'.join(
+        f"<tr><td>{h['Month']}</td><td>{h['Sales']:,}</td><td>{money(h['Revenue'])}</td><td>{money(h['Cost'])}</td>"
+        f"<td>{money(h['Profit'])}</td><td>{money(h['Capital'])}</td><td class=\"text\">{html.escape(h['Event'])}</td></tr>"
+        for h in history)
+    body = _templates['team'].substitute(
+        team=html.escape(team), style=html.escape(data.get('style', '-')), price=data.get('final_price', '-'),
+        direct_cost=data.get('direct_cost', '-'), fixed_cost=f"{data.get('total_indirect_cost', 0):,}",
+        status=status, status_class=status_class,
+        chart_title=f"{engine.last_month(data)} 個月長期經營-資金變化" if 'campaign' in data else "三個月生存戰-資金變化",
+        chart=svg_line_chart([h['Month'] for h in history], [h['Capital'] for h in history]),
+        rows=rows, debt_note=f"<p class=\"bad\">📢 仍欠地下錢莊 {money(debt)}，上述 Capital 尚未扣除此負債。</p>" if debt > 0 else '')
+    filename = f"{Path(path).stem}.html"
+    (Path(out_dir) / filename).write_text(_templates['page'].substitute(title=html.escape(team), body=body), encoding='utf-8')
+    # 只回傳全班總結需要的少量欄位
+    return {'team': team, 'file': filename, 'style': data.get('style'), 'finished': finished,
+            'net_assets': net_assets, 'debt': debt,
+            'choices': [(engine.month_event(data, month), h['Event'][:1]) for month, h in enumerate(history[1:], start=1)]}
+
+
+# --- 3. 全班總結 ---
+def render_summary(summaries):
+    finished = [s for s in summaries if s['finished']]
+    net = sorted(s['net_assets'] for s in finished)
+    bankrupt = sum(1 for v in net if v <= 0)
+    freq = collections.defaultdict(collections.Counter)
+    # 長期經營模式的事件是抽出來的，依事件 (而非月份) 統計，兩種模式才能合併
+    for s in summaries:
+        for event, option in s['choices']:
+            freq[event][option] += 1
+    choice_rows = '\n'.join(f"<tr><td class=\"text\">{e['title']}</td>" + ''.join(f"<td>{freq[k][o]}</td>" for o in 'ABC') + "</tr>"
+                            for k, e in engine.MONTH_EVENTS.items())
+    team_rows = '\n'.join(
+        f"<tr><td class=\"text\"><a href=\"{html.escape(s['file'])}\">{html.escape(s['team'])}</a></td><td>{s['style'] or '-'}</td>"
+        f"<td>{money(s['net_assets']) if s['finished'] else '未完賽'}</td><td>{money(s['debt'])}</td></tr>"
+        for s in sorted(summaries, key=lambda s: (not s['finished'], -s['net_assets'])))
+    body = Template(SUMMARY_TEMPLATE).substitute(
+        teams=len(summaries), finished=len(finished),
+        bankrupt_rate=f"{bankrupt / len(finished):.0%}" if finished else '-',
+        median=f"{net[len(net) // 2]:,}" if net else '-',
+        histogram=svg_histogram(net), choice_rows=choice_rows, team_rows=team_rows)
+    return Template(PAGE_TEMPLATE).substitute(title='全班總結', body=body)
+
+
+def export_reports(record_dir=None, out_dir=DEFAULT_OUT, workers=None):
+    paths = records.list_record_paths(record_dir)
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        summaries = list(pool.map(render_team, paths, [out] * len(paths), chunksize=chunksize))
+    (out / 'index.html').write_text(render_summary(summaries), encoding='utf-8')
+    return summaries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', default=str(records.RECORD_DIR), help='隊伍紀錄資料夾')
+    parser.add_argument('--out', default=DEFAULT_OUT, help='輸出資料夾')
+    parser.add_argument('--workers', type=int, default=None, help='process 數 (預設為 CPU 核心數)')
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    summaries = export_reports(args.records, args.out, args.workers)
+    print(f"已匯出 {len(summaries)} 隊戰報到 {args.out}/ ({time.perf_counter() - start:.1f} 秒)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""遊戲規則版本 (rule set) 的外掛註冊表。
+
+每個規則版本都實作同一個介面 (RuleSet)：predict_sales / predict_sales_batch / play，
+由 regress.py 以同一批決策重播、比較不同版本的結果。
+
+內建版本：
+    current   目前 costgame.py 使用的規則 (engine.py)
+    v1141101  his/costgame(v1141101).py 的規則 (多隊伍版，M0 事件文字不同)
+
+his/costgame.py 是更早的版本，只有損益兩平分析、沒有 AI 銷量模型與生存戰，
+無法以同一批決策重播，因此沒有註冊。
+
+調整平衡時不必複製整份規則，可用 variant() 以設定覆寫建立新版本，例如在外掛檔中：
+
+    import rulesets
+    rulesets.register(rulesets.variant('cheap-a', 'current', {'styles': {'A': {'rent': 40000}}}))
+
+再以 `python regress.py current cheap-a --plugin my_rules.py` 比較。
+"""
+import copy
+import importlib.util
+import random
+
+import numpy as np
+
+import engine
+
+RULESETS = {}
+
+
+class RuleSet:
+    name = 'current'
+    description = '目前 costgame.py 使用的規則'
+
+    def __init__(self, config=None):
+        self.config = config or engine.GAME_CONFIG
+
+    def predict_sales(self, style_key, price, marketing_budget):
+        return engine.predict_sales(style_key, price, marketing_budget, self.config)
+
+    def predict_sales_batch(self, styles, prices, marketing_budgets):
+        return engine.predict_sales_batch(styles, prices, marketing_budgets, self.config)
+
+    def play(self, decision, rng=None):
+        """玩完一整局，回傳最終 team dict"""
+        rng = rng or random.Random(decision.get('seed'))
+        return engine.play_game(decision, rng, self.predict_sales, self.config)
+
+
+class V1141101(RuleSet):
+    # 從 his/costgame(v1141101).py 原樣移植：參數、predict_sales 與整局流程 (定價、M0、
+    # 地下錢莊、M1~M3) 各自保留一份，不呼叫 engine 的回合函式，之後修改 engine.py 時仍能與舊版比較。
+    # 舊版的銷量公式參數寫死在程式裡，這裡放進 CONFIG['demand']，variant() 才能覆寫。
+    name = 'v1141101'
+    description = 'his/costgame(v1141101).py 多隊伍版的規則'
+    CONFIG = {
+        'styles': {
+            'A': {'label': 'A. 校門口黃金店面 (旗艦店)', 'rent': 50000, 'depreciation': 20000, 'base_traffic': 3000},
+            'B': {'label': 'B. 側門舒適店面 (標準店)', 'rent': 25000, 'depreciation': 12000, 'base_traffic': 1500},
+            'C': {'label': 'C. 巷弄老宅咖啡 (風格店)', 'rent': 10000, 'depreciation': 5000, 'base_traffic': 500}
+        },
+        'beans': {'普通商用豆': 15, '中級莊園豆': 25, '頂級藝妓豆': 40},
+        'milks': {'一般鮮乳': 5, '燕麥奶': 8, '不加奶': 0},
+        'material': 3,
+        'demand': {
+            'reference_price': 150,
+            'price_slope': 18,
+            'marketing_multiplier': {'A': 1, 'B': 5, 'C': 10},
+            'low_budget_penalty': {'C': 300},
+            'low_budget_threshold': 3000,
+            'max_sales': 10000,
+            'budget_per_min_sale': 500,
+        },
+    }
+    STARTING_CAPITAL = 30000
+    LOAN_AMOUNT = 30000
+    INTEREST_RATE = 0.1
+    GAMBLE_FAIL_RATE = 0.3
+    OPTIONS = {
+        1: ["A. 佛心凍漲", "B. 漲價反映", "C. 我沒賣牛奶~爽!"],
+        2: ["A. 割喉跟進", "B. 品牌固樁", "C. 躺平就好"],
+        3: ["A. 買二手應急", "B. 租賃新機", "C. 手沖硬撐"],
+    }
+
+    def __init__(self, config=None):
+        super().__init__(config or self.CONFIG)
+
+    def predict_sales(self, style_key, price, marketing_budget):
+        demand = self.config['demand']
+        base = self.config['styles'][style_key]['base_traffic']
+        price_factor = (demand['reference_price'] - price) * demand['price_slope']
+        penalty = demand['low_budget_penalty'].get(style_key)
+        threshold = demand['low_budget_threshold']
+        if penalty and marketing_budget < threshold:
+            marketing_effect = -penalty + (marketing_budget / threshold) * penalty
+        else:
+            marketing_effect = np.sqrt(marketing_budget) * demand['marketing_multiplier'][style_key]
+        predicted = base + price_factor + marketing_effect
+        min_guarantee = int(marketing_budget / demand['budget_per_min_sale'])
+        return int(max(min_guarantee, min(demand['max_sales'], predicted)))
+
+    def play(self, decision, rng=None):
+        if decision.get('months'):
+            raise ValueError("v1141101 沒有長期經營模式")
+        rng = rng or random.Random(decision.get('seed'))
+        cfg = self.config
+        # S1、S2
+        style_cfg = cfg['styles'][decision['style']]
+        est = {'租金': style_cfg['rent'], '折舊': style_cfg['depreciation'], '人事': decision.get('staff', 30000),
+               '營業': decision.get('op', 10000), '行銷': decision.get('mkt', 5000)}
+        dc = cfg['beans'][decision['bean']] + cfg['milks'][decision['milk']] + cfg['material']
+        fc = sum(est.values())
+        team = {'style': decision['style'], 'bean': decision['bean'], 'milk': decision['milk'], 'direct_cost': dc,
+                'estimated_indirect': est, 'total_indirect_cost': fc}
+        # S3
+        sales_forecast, margin = decision.get('sales_forecast', 1000), decision.get('margin', 50)
+        suggested = int((dc + (fc / sales_forecast)) * (1 + margin / 100))
+        final_p = decision.get('price') or suggested
+        ai_sales = self.predict_sales(team['style'], final_p, est['行銷'])
+        revenue = final_p * ai_sales
+        total_cost = int((dc * ai_sales) + fc)
+        cm = final_p - dc
+        bep = fc / cm if cm > 0 else float('inf')
+        team.update({'sales_forecast': sales_forecast, 'profit_margin': margin, 'suggested_price': suggested,
+                     'final_price': final_p, 'ai_predicted_sales': ai_sales, 'actual_profit': revenue - total_cost,
+                     's3_revenue': revenue, 's3_cost': total_cost, 'bep': int(bep)})
+        # M0
+        s3_profit = team['actual_profit']
+        initial_capital = max(self.STARTING_CAPITAL, s3_profit)
+        team.update({'capital': initial_capital, 'debt': 0, 's4_month': 1, 'history': [{
+            'Month': 'M0', 'Event': "M0 開局" + (" (媽媽贊助)" if s3_profit < self.STARTING_CAPITAL else ""),
+            'Sales': ai_sales, 'Revenue': revenue, 'Cost': total_cost, 'Profit': s3_profit, 'Capital': initial_capital}]})
+        # M1~M3
+        for month, choice in enumerate(decision.get('choices', [])[:3], start=1):
+            choice = self._option(month, choice)
+            if team['capital'] <= 0:
+                team['capital'] += self.LOAN_AMOUNT
+                team['debt'] += self.LOAN_AMOUNT
+            self._play_month(team, month, choice, rng)
+        return team
+
+    def _option(self, month, choice):
+        for label in self.OPTIONS[month]:
+            if label.startswith(choice[:1]):
+                return label
+        raise ValueError(f"M{month} 沒有對策 {choice!r}")
+
+    def _play_month(self, team, month, choice, rng):
+        cfg, note = self.config, ""
+        price, fc = team['final_price'], team['total_indirect_cost']
+        base_sales = team.get('ai_predicted_sales', 1000)
+        if month == 1:
+            if choice.startswith("C") and team['milk'] == '一般鮮乳':
+                raise ValueError(f"M1 對策 {choice} 不合法 (第一關選了鮮奶)")
+            milk_cost_increase = cfg['milks'][team['milk']] if team['milk'] == '一般鮮乳' and choice[0] in "AB" else 0
+            new_dc = team['direct_cost'] + milk_cost_increase
+            new_price = int(price * 1.2) if choice.startswith("B") else price
+            sales = self.predict_sales(team['style'], new_price, team['estimated_indirect']['行銷'])
+            revenue = int(new_price * sales)
+            base_cost = (new_dc * sales) + fc
+        elif month == 2:
+            if choice.startswith("A"): new_price, sales, new_fc = int(price * 0.5), base_sales, fc
+            elif choice.startswith("B"): new_price, sales, new_fc = price, int(base_sales * 0.9), fc + 30000
+            else: new_price, sales, new_fc = price, int(base_sales * 0.25), fc
+            revenue = int(new_price * sales)
+            base_cost = (team['direct_cost'] * sales) + new_fc
+        else:
+            if choice.startswith("A"):
+                new_fc = fc + 80000
+                is_fail = rng.random() < self.GAMBLE_FAIL_RATE
+                sales = int(base_sales * 0.5) if is_fail else base_sales
+                note = " (💥賭輸爆炸!)" if is_fail else " (✨賭贏了!)"
+            elif choice.startswith("B"): new_fc, sales = fc + 40000, min(base_sales, 2000)
+            else: new_fc, sales = fc, min(base_sales, 800)
+            revenue = int(price * sales)
+            base_cost = (team['direct_cost'] * sales) + new_fc
+        interest = int(team['debt'] * self.INTEREST_RATE)
+        total_cost = int(base_cost + interest)
+        profit = revenue - total_cost
+        team['capital'] += profit
+        team['history'].append({'Month': f'M{month}', 'Event': choice + note, 'Sales': sales, 'Revenue': revenue,
+                                'Cost': total_cost, 'Profit': profit, 'Capital': team['capital']})
+        team['s4_month'] = month + 1
+
+
+# --- 註冊與載入 ---
+def register(ruleset):
+    """註冊一個 RuleSet 實例，或以 @register 裝飾 RuleSet 子類別"""
+    instance = ruleset() if isinstance(ruleset, type) else ruleset
+    RULESETS[instance.name] = instance
+    return ruleset
+
+
+def get_ruleset(name):
+    try:
+        return RULESETS[name]
+    except KeyError:
+        raise KeyError(f"未知的規則版本 {name!r}，可用：{', '.join(sorted(RULESETS))}") from None
+
+
+def variant(name, base, overrides, description=''):
+    """以設定覆寫 (巢狀 dict) 從既有版本衍生新版本"""
+    parent = get_ruleset(base)
+    ruleset = copy.copy(parent)
+    ruleset.name = name
+    ruleset.description = description or f"{base} + {overrides}"
+    ruleset.config = engine.merge_config(parent.config, overrides)
+    return ruleset
+
+
+def load_plugin(path):
+    """匯入外掛檔；外掛在匯入時自行呼叫 register()"""
+    spec = importlib.util.spec_from_file_location(f"costgame_rules_{len(RULESETS)}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+register(RuleSet)
+register(V1141101)
@@ -0,0 +1,68 @@
+"""隊伍狀態的快照：第一~三關做決定之前各存一份，讓學生在進入生存戰前能回到任何一步重新決定。
+
+快照不深拷貝整個 team dict，只記錄與上一份快照不同的欄位 (值本身共用，不會被就地修改)；
+history 只記錄新增的那幾列。整條快照鏈的記憶體因此只和「改過的東西」成正比。
+
+    snap = take(parent, team, '第二關：預算', stage=2)
+    team, stage = restore(snap)
+"""
+_HISTORY = 'history'
+
+
+class Snapshot:
+    __slots__ = ('parent', 'label', 'stage', 'changes', 'removed', 'rows', 'depth')
+
+    def __init__(self, parent, label, stage, changes, removed, rows):
+        self.parent = parent
+        self.label = label
+        self.stage = stage
+        self.changes = changes    # 與上一份不同的欄位 (history 只記存在與否)
+        self.removed = removed    # 上一份有、這一份沒有的欄位
+        self.rows = rows          # history 新增的列
+        self.depth = parent.depth + 1 if parent else 0
+
+
+def chain(snapshot):
+    """由舊到新列出整條快照鏈"""
+    snaps = []
+    while snapshot is not None:
+        snaps.append(snapshot)
+        snapshot = snapshot.parent
+    return snaps[::-1]
+
+
+def _fields(snapshot):
+    fields, rows = {}, []
+    for snap in chain(snapshot):
+        fields.update(snap.changes)
+        for key in snap.removed:
+            fields.pop(key, None)
+        if _HISTORY not in fields:
+            rows = []
+        rows.extend(snap.rows)
+    return fields, rows
+
+
+def take(parent, team, label, stage):
+    fields, rows = _fields(parent)
+    changes = {k: v for k, v in team.items()
+               if k != _HISTORY and (k not in fields or (fields[k] is not v and fields[k] != v))}
+    removed = tuple(k for k in fields if k not in team)
+    history = team.get(_HISTORY)
+    new_rows = ()
+    if history is not None:
+        if _HISTORY not in fields:
+            changes[_HISTORY] = True
+            rows = []
+        # engine 只會在 history 後面附加，前面的列和上一份快照共用
+        new_rows = tuple(history[len(rows):])
+    return Snapshot(parent, label, stage, changes, removed, new_rows)
+
+
+def restore(snapshot):
+    """回傳 (新的 team dict, 關卡)；history 是新的 list，之後附加不會影響快照"""
+    fields, rows = _fields(snapshot)
+    team = {k: v for k, v in fields.items() if k != _HISTORY}
+    if _HISTORY in fields:
+        team[_HISTORY] = list(rows)
+    return team, snapshot.stage
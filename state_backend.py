@@ -0,0 +1,114 @@
+"""多個 Streamlit worker 共用的狀態儲存 (同一台機器上的 SQLite，WAL 模式)。
+
+設定 COSTGAME_STATE_DB=<檔案路徑> 後啟用 (deploy/launch.py 會自動設定)；未設定時
+ENABLED 為 False，畫面照舊只用各 worker 自己的記憶體。
+
+只有一張 key-value 表：(namespace, key) -> value。WAL 模式下多個 worker 可同時讀、
+寫入依序進行 (等待上限 BUSY_TIMEOUT 秒)。目前使用的 namespace：
+
+    team       每隊的進度 (JSON)，以網址上的 ?team=<代碼> 找回；worker 重啟或換到別的 worker 也能接著玩
+    prefetch   背景預先計算的結果 (pickle)；相同設定的隊伍在所有 worker 間共用，過期由 prefetch.purge_shared() 清除
+
+pickle 只用於本機各 worker 自己寫入的快取，資料庫檔不要放在其他人可寫的位置。
+"""
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+DB_PATH = os.environ.get('COSTGAME_STATE_DB', '')
+ENABLED = bool(DB_PATH)
+BUSY_TIMEOUT = float(os.environ.get('COSTGAME_STATE_DB_TIMEOUT', '10'))
+
+SCHEMA = """CREATE TABLE IF NOT EXISTS kv (
+    ns TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (ns, key)
+) WITHOUT ROWID"""
+
+_local = threading.local()
+
+
+# --- 1. 連線 (每個 thread 一條) ---
+def connect(path=None):
+    path = str(path or DB_PATH)
+    conns = _local.__dict__.setdefault('conns', {})
+    conn = conns.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(SCHEMA)
+        conns[path] = conn
+    return conn
+
+
+# --- 2. 讀寫 ---
+def get_raw(ns, key, path=None):
+    row = connect(path).execute('SELECT value FROM kv WHERE ns = ? AND key = ?', (ns, key)).fetchone()
+    return row[0] if row else None
+
+
+def put_raw(ns, key, value, path=None):
+    connect(path).execute('INSERT OR REPLACE INTO kv (ns, key, value, updated) VALUES (?, ?, ?, ?)',
+                          (ns, key, value, time.time()))
+
+
+def delete(ns, key, path=None):
+    connect(path).execute('DELETE FROM kv WHERE ns = ? AND key = ?', (ns, key))
+
+
+def purge(ns, older_than, path=None):
+    """刪除 older_than 秒前更新的資料，回傳刪除筆數"""
+    cur = connect(path).execute('DELETE FROM kv WHERE ns = ? AND updated < ?', (ns, time.time() - older_than))
+    return cur.rowcount
+
+
+def get_json(ns, key, path=None):
+    value = get_raw(ns, key, path)
+    return json.loads(value) if value is not None else None
+
+
+def put_json(ns, key, value, path=None):
+    put_raw(ns, key, json.dumps(value, ensure_ascii=False), path)
+
+
+def get_pickle(ns, key, path=None):
+    value = get_raw(ns, key, path)
+    return pickle.loads(value) if value is not None else None
+
+
+def put_pickle(ns, key, value, path=None):
+    put_raw(ns, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), path)
+
+
+# --- 3. 隊伍進度 ---
+def save_team(token, name, stage, data, rev=None, path=None):
+    """寫入隊伍進度並回傳新的版本號 (rev)。
+
+    給了 rev 時只在資料庫裡仍是這個版本才寫入，否則回傳 None：同一隊開在兩個分頁或
+    兩個 worker 時，以舊畫面送出的決定不會蓋掉另一邊已經寫入的進度。
+    """
+    conn = connect(path)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        current = get_json('team', token, path)
+        current_rev = current.get('rev', 0) if current else 0
+        if rev is not None and rev != current_rev:
+            conn.execute('ROLLBACK')
+            return None
+        put_json('team', token, {'name': name, 'stage': stage, 'data': data, 'rev': current_rev + 1}, path)
+        conn.execute('COMMIT')
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    return current_rev + 1
+
+
+def load_team(token, path=None):
+    return get_json('team', token, path)
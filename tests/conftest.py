@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 各模組都放在專案根目錄，直接匯入
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,72 @@
+import admission
+
+
+def test_claim_drops_duplicate_submit_on_same_screen():
+    state = admission.new_state()
+    assert admission.claim(state, 'stage1')
+    admission.committed(state)
+    assert not admission.claim(state, 'stage1')
+    assert admission.claim(state, 'stage2')
+
+
+def test_failed_write_can_be_submitted_again():
+    state = admission.new_state()
+    # 寫入途中出錯 (例如售價低於直接成本)：committed() 沒被呼叫
+    assert admission.claim(state, 'stage3_p2')
+    admission.shown(state)
+    assert admission.claim(state, 'stage3_p2')
+    admission.committed(state)
+    assert not admission.claim(state, 'stage3_p2')
+
+
+def test_reload_from_other_tab_allows_resubmit():
+    state = admission.new_state()
+    assert admission.claim(state, 'stage3_p1')
+    # 另一個分頁已先寫入：reload_team() 換成資料庫的進度，這次送出不算數
+    admission.reloaded(state)
+    admission.shown(state)
+    assert state['shown'] == 1
+    assert admission.claim(state, 'stage3_p1')
+    admission.committed(state)
+    assert not admission.claim(state, 'stage3_p1')
+
+
+def test_claim_accepts_same_form_after_new_screen():
+    state = admission.new_state()
+    assert admission.claim(state, 'm1')
+    admission.committed(state)
+    # 畫面還沒重畫完 (rerun 被中斷)：仍是舊畫面，再送出一次視為重複
+    assert not admission.claim(state, 'm1')
+    admission.shown(state)
+    assert admission.claim(state, 'm1')
+
+
+def test_claim_remembers_only_recent_keys():
+    state = admission.new_state()
+    for i in range(admission.DONE_KEYS + 1):
+        assert admission.claim(state, f"form{i}")
+        admission.committed(state)
+    assert not admission.claim(state, f"form{admission.DONE_KEYS}")
+    assert admission.claim(state, 'form0')
+
+
+def test_team_lock_is_shared_per_team_and_released():
+    lock = admission.team_lock('team-a')
+    assert admission.team_lock('team-a') is lock
+    assert admission.team_lock('team-b') is not lock
+    del lock
+    assert 'team-a' not in admission._team_locks
+
+
+def test_heavy_falls_back_when_slots_are_taken(monkeypatch):
+    monkeypatch.setattr(admission, 'HEAVY_TIMEOUT', 0.01)
+    holders = [admission._heavy.acquire(blocking=False) for _ in range(admission.HEAVY_RENDERS)]
+    try:
+        with admission.heavy('test') as admitted:
+            assert not admitted
+    finally:
+        for taken in holders:
+            if taken:
+                admission._heavy.release()
+    with admission.heavy('test') as admitted:
+        assert admitted
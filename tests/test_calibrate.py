@@ -0,0 +1,54 @@
+import numpy as np
+
+import calibrate
+import engine
+
+TRUE = {'styles': {'A': {'base_traffic': 2600}, 'B': {'base_traffic': 1800}, 'C': {'base_traffic': 700}},
+        'demand': {'price_slope': 12.5, 'marketing_multiplier': {'A': 2.0, 'B': 4.0, 'C': 8.0}}}
+
+
+def observations(config, styles='ABC', n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    style = rng.choice(list(styles), n)
+    price = rng.integers(60, 260, n)
+    budget = rng.integers(0, 60000, n)
+    sales = [engine.predict_sales(s, int(p), int(b), config) for s, p, b in zip(style, price, budget)]
+    return style, price.astype(float), budget.astype(float), np.array(sales, dtype=float)
+
+
+def test_fit_recovers_known_parameters():
+    config = engine.merge_config(engine.GAME_CONFIG, TRUE)
+    params, info = calibrate.fit(*observations(config))
+    # 銷量取整數，參數只差捨入誤差
+    np.testing.assert_allclose(params, calibrate.current_params(config), rtol=0.02)
+    assert info['missing_styles'] == [] and info['r2'] > 0.999
+
+
+def test_partial_coverage_keeps_shared_price_slope():
+    config = engine.merge_config(engine.GAME_CONFIG, TRUE)
+    params, info = calibrate.fit(*observations(config, styles='A'))
+    current = calibrate.current_params(engine.GAME_CONFIG)
+    names = calibrate.param_names(engine.GAME_CONFIG)
+    assert info['missing_styles'] == ['B', 'C']
+    for name, old, new in zip(names, current, params):
+        if name in ('price_slope', 'base_traffic.B', 'base_traffic.C',
+                    'marketing_multiplier.B', 'marketing_multiplier.C'):
+            assert new == old
+
+
+def test_fit_to_target_with_partial_target_keeps_price_slope():
+    styles, prices, budgets, _ = observations(engine.GAME_CONFIG, n=600)
+    target = {'A': {'0.1': 800, '0.5': 2000, '0.9': 3500}}
+    params, info = calibrate.fit_to_target(target, styles, prices, budgets)
+    k = len(engine.GAME_CONFIG['styles'])
+    assert info['missing_styles'] == ['B', 'C']
+    assert params[k] == engine.GAME_CONFIG['demand']['price_slope']
+
+
+def test_main_warns_about_missing_styles(tmp_path, capsys):
+    obs = tmp_path / 'obs.jsonl'
+    rows = zip(*observations(engine.GAME_CONFIG, styles='A', n=200))
+    obs.write_text(''.join(f'{{"style": "{s}", "price": {p}, "mkt": {b}, "sales": {y}}}\n' for s, p, b, y in rows)
+                   + '\n', encoding='utf-8')
+    assert calibrate.main(['--observations', str(obs), '--output', str(tmp_path / 'out.json')]) == 0
+    assert '沒有店型 B, C 的資料' in capsys.readouterr().err
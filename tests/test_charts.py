@@ -0,0 +1,30 @@
+import charts
+import engine
+
+
+def campaign_history(months=12):
+    return engine.play_game({'style': 'A', 'bean': '普通商用豆', 'milk': '燕麥奶', 'months': months,
+                             'choices': ['B'] * months, 'seed': 3})['history']
+
+
+def test_history_view_grows_month_by_month():
+    history = campaign_history()
+    view = charts.HistoryView(4)   # 容量不足時自動加大
+    for n in range(1, len(history) + 1):
+        assert view.sync(history[:n]) == 1
+    assert view.sync(history) == 0
+    assert list(view.fig.data[0].y) == [h['Capital'] for h in history]
+    table = view.table()
+    assert list(table.columns) == charts.REPORT_COLUMNS
+    assert table['Capital'].tolist() == [f"${h['Capital']:,}" for h in history]
+    assert table['Sales'].tolist() == [f"{h['Sales']:,}" for h in history]
+
+
+def test_history_view_rebuilds_when_history_is_replaced():
+    history = campaign_history()
+    view = charts.HistoryView(len(history))
+    view.sync(history)
+    replaced = [dict(h) for h in history[:5]]
+    replaced[-1]['Capital'] = -1
+    assert view.sync(replaced) == 5
+    assert view.size == 5 and view.table()['Capital'].iloc[-1] == '$-1'
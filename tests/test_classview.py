@@ -0,0 +1,38 @@
+import warnings
+
+import numpy as np
+
+import classview
+import engine
+import records
+
+
+def test_facet_trace_breaks_lines_between_teams():
+    capital = np.array([[1.0, 2.0, 3.0], [4.0, np.nan, np.nan]])
+    x, y, text = classview.facet_trace(capital, ['甲', '乙'])
+    np.testing.assert_array_equal(x, [0, 1, 2, np.nan, 0, 1, 2, np.nan])
+    np.testing.assert_array_equal(y, [1, 2, 3, np.nan, 4, np.nan, np.nan, np.nan])
+    assert list(text) == ['甲'] * 4 + ['乙'] * 4
+
+
+def test_store_reads_only_changed_records(tmp_path):
+    classic = engine.play_game({'style': 'A', 'bean': '普通商用豆', 'milk': '燕麥奶', 'choices': ['B'] * 3, 'seed': 1})
+    campaign = engine.play_game({'style': 'A', 'bean': '普通商用豆', 'milk': '燕麥奶', 'months': 12,
+                                 'choices': ['B'] * 12, 'seed': 2})
+    records.save_team_record('經典', 's1', classic, tmp_path)
+    records.save_team_record('長期', 's2', campaign, tmp_path)
+    store = classview.HistoryStore(teams=1)
+    assert store.refresh(tmp_path) == 2
+    assert store.refresh(tmp_path) == 0
+    capital, style, names = store.columns()
+    assert capital.shape == (2, 13) and list(style) == [0, 0]
+    row = names.index('經典')
+    assert list(capital[row, :4]) == [h['Capital'] for h in classic['history']]
+    assert np.isnan(capital[row, 4:]).all()
+    # 經典與長期經營同一面：後面的月份只有部分隊伍有值，中位數不應產生警告
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        fig = classview.build_class_chart(store)
+    median = fig.data[1].y
+    assert median[0] == np.median([classic['history'][0]['Capital'], campaign['history'][0]['Capital']])
+    assert median[12] == campaign['history'][12]['Capital']
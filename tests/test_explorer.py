@@ -0,0 +1,24 @@
+import engine
+import explorer
+import prefetch
+import regress
+
+
+def test_payload_matches_scalar_model():
+    decision = regress.generate_corpus(1, seed=4)[0]
+    team = engine.new_team(decision)
+    curve = prefetch.price_curve(prefetch.setup_of(team))
+    data = explorer.payload(curve, team, 10 ** 6)
+    assert data['start'] == prefetch.PRICE_MAX
+    assert explorer.payload(curve, team, 0)['start'] == 1
+    mkt = team['estimated_indirect']['行銷']
+    for price in [1, 99, 150, prefetch.PRICE_MAX]:
+        assert data['sales'][price - data['p0']] == engine.predict_sales(team['style'], price, mkt)
+    assert (data['dc'], data['fc']) == (team['direct_cost'], team['total_indirect_cost'])
+
+
+def test_price_is_sent_back_only_from_the_button():
+    # 拖拉滑桿只在瀏覽器重畫；只有「帶入此售價」會觸發 rerun
+    assert 'id="pick"' in explorer.HTML
+    assert "button.addEventListener('click', pick)" in explorer.JS
+    assert "slider.addEventListener('change'" not in explorer.JS
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+import charts
+import engine
+import governor
+
+
+@pytest.fixture(autouse=True)
+def fresh_governor(monkeypatch):
+    monkeypatch.setattr(governor, '_sessions', governor.OrderedDict())
+    monkeypatch.setattr(governor, '_rerunning', set())
+    monkeypatch.setattr(governor, 'BUDGET_BYTES', 3 * 1024 * 1024)
+
+
+def fill(session, mb=1):
+    governor.artifacts(session)['curve'] = np.zeros(mb * 1024 * 1024, dtype=np.uint8)
+    governor.end_rerun(session)
+
+
+def test_budget_evicts_least_recently_used_sessions():
+    for sid in ['a', 'b', 'c']:
+        fill(sid)
+    governor.artifacts('a')      # a 剛用過，b 變成最久沒用
+    governor.end_rerun('a')
+    fill('d')
+    assert list(governor._sessions) == ['c', 'a', 'd']
+    assert governor.stats()['budget_evictions'] == 1
+
+
+def test_budget_skips_sessions_mid_rerun():
+    for sid in ['a', 'b', 'c']:
+        fill(sid)
+    governor.artifacts('a')      # a 正在另一個執行緒 rerun，還沒呼叫 end_rerun
+    governor._sessions.move_to_end('a', last=False)
+    fill('d')
+    assert 'a' in governor._sessions and 'b' not in governor._sessions
+
+
+def test_grown_artifact_is_measured_again():
+    history = engine.play_game({'style': 'A', 'bean': '普通商用豆', 'milk': '燕麥奶', 'months': 36,
+                                'choices': ['B'] * 36, 'seed': 0})['history']
+    cache = governor.artifacts('s')
+    view = cache['view'] = charts.HistoryView(len(history))
+    view.sync(history[:2])
+    governor.end_rerun('s')
+    first = governor._sessions['s'].sizes['view']
+    governor.artifacts('s')
+    if view.sync(history):
+        governor.invalidate('s', 'view')
+    governor.end_rerun('s')
+    assert governor._sessions['s'].sizes['view'] > first
@@ -0,0 +1,35 @@
+import json
+
+import engine
+import headless
+import regress
+
+
+def decision_lines(n):
+    return [json.dumps(d, ensure_ascii=False) for d in regress.generate_corpus(n, seed=7)]
+
+
+def test_run_matches_engine_and_keeps_line_numbers():
+    lines = decision_lines(5)
+    lines.insert(2, '   ')                          # 空白行略過，但仍佔一個行號
+    lines.append('{"style": "Z", "choices": []}')    # 錯誤記在該行，不中斷整批
+    out = [(json.loads(text), net) for text, net in headless.run(lines)]
+    assert [r['line'] for r, _ in out] == [1, 2, 4, 5, 6, 7]
+    for (result, net), decision in zip(out, regress.generate_corpus(5, seed=7)):
+        team = engine.play_game(decision)
+        assert result == {'line': result['line'], **regress.summarize(team)}
+        assert net == team['capital'] - team['debt']
+    last, net = out[-1]
+    assert net is None and last['error'].startswith('KeyError')
+
+
+def test_run_with_jobs_matches_in_process():
+    lines = decision_lines(40)
+    assert list(headless.run(lines, jobs=2, chunksize=4)) == list(headless.run(lines))
+
+
+def test_tally():
+    tally = headless.Tally()
+    for net in (100, -50, None, 0):
+        tally.add(net)
+    assert tally.summary() == {'games': 4, 'errors': 1, 'bankrupt_rate': 2 / 3, 'mean_net_assets': 50 / 3}
@@ -0,0 +1,44 @@
+import time
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    monkeypatch.setattr(metrics, '_histograms', {})
+    monkeypatch.setattr(metrics, '_gauges', {})
+
+
+def test_render_prometheus_histograms_and_gauges():
+    for v in (0.0005, 0.003, 0.003, 7.0):
+        metrics.observe('stage.s1', v)
+    metrics.observe('session_state_bytes', 2000, metrics.SIZE_BUCKETS)
+    metrics.set_gauge('session_state_bytes', 'abc', 2000)
+    lines = metrics.render_prometheus().splitlines()
+    assert '# TYPE costgame_stage_s1_seconds histogram' in lines
+    assert 'costgame_stage_s1_seconds_bucket{le="0.001"} 1' in lines
+    assert 'costgame_stage_s1_seconds_bucket{le="0.005"} 3' in lines
+    assert 'costgame_stage_s1_seconds_bucket{le="5.0"} 3' in lines
+    assert 'costgame_stage_s1_seconds_bucket{le="+Inf"} 4' in lines
+    assert 'costgame_stage_s1_seconds_count 4' in lines
+    # 大小的直方圖不加 _seconds
+    assert 'costgame_session_state_bytes_bucket{le="4096"} 1' in lines
+    assert 'costgame_session_state_bytes_current{session="abc"} 2000' in lines
+
+
+def test_render_prometheus_drops_stale_gauges():
+    metrics.set_gauge('session_state_bytes', 'old', 1)
+    metrics._gauges[('session_state_bytes', 'old')] = (1, time.time() - metrics.GAUGE_TTL - 1)
+    metrics.set_gauge('session_state_bytes', 'new', 2)
+    text = metrics.render_prometheus()
+    assert 'session="new"' in text and 'session="old"' not in text
+
+
+def test_histogram_quantile_uses_bucket_upper_bound():
+    hist = metrics.Histogram(metrics.TIME_BUCKETS)
+    for v in (0.002, 0.002, 0.02, 0.2):
+        hist.observe(v)
+    assert hist.quantile(0.5) == 0.0025
+    assert hist.quantile(0.95) == 0.25
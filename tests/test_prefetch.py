@@ -0,0 +1,87 @@
+import copy
+import random
+from concurrent.futures import Future
+
+import pytest
+
+import engine
+import prefetch
+import regress
+
+
+def settled_setups(n, seed=5):
+    for decision in regress.generate_corpus(n, seed=seed):
+        team = engine.new_team(decision)
+        yield team, decision['price'] or engine.suggested_price(team, decision['sales_forecast'], decision['margin'])
+
+
+def test_price_curve_matches_predict_sales():
+    for team, _ in settled_setups(20):
+        curve = prefetch.price_curve(prefetch.setup_of(team))
+        lookup = prefetch.curve_sales_fn(curve)
+        mkt = team['estimated_indirect']['行銷']
+        for price in [1, 50, 137, prefetch.PRICE_MAX, prefetch.PRICE_MAX + 1]:
+            assert lookup(team['style'], price, mkt) == engine.predict_sales(team['style'], price, mkt)
+
+
+def test_price_bundle_matches_engine():
+    for team, price in settled_setups(50):
+        setup = prefetch.setup_of(team)
+        curve = prefetch.price_curve(setup)
+        expected = copy.deepcopy(team)
+        engine.settle_pricing(expected, price)
+        for bundle in (prefetch.price_bundle(setup, price), prefetch.price_bundle(setup, price, curve)):
+            assert bundle['settled'] == {k: expected[k] for k in prefetch.SETTLED_KEYS}
+            assert bundle['outcomes'] == engine.outcome_table(expected)
+
+
+def test_result_reuses_scheduled_future():
+    cache, calls = {}, []
+
+    def job(x):
+        calls.append(x)
+        return x * 2
+
+    prefetch.schedule(cache, 'k', job, 21)
+    assert isinstance(cache['k'], Future)
+    assert prefetch.result(cache, 'k', job, 21) == 42
+    assert prefetch.peek(cache, 'k') == 42
+    assert calls == [21]
+    assert prefetch.result(cache, 'other', job, 1) == 2
+
+
+def test_outcome_table_matches_month_outcome():
+    for decision in regress.generate_corpus(300, seed=1):
+        try:
+            team = engine.play_game(dict(decision, choices=[]))
+        except ValueError:
+            continue
+        table = engine.outcome_table(team)
+        for event, options in engine.MONTH_OPTIONS.items():
+            for label in options:
+                win, lose = table[(event, label[0])]
+                assert win == engine.month_outcome(team, event, label, engine._FixedDraw(1.0))
+                assert lose == engine.month_outcome(team, event, label, engine._FixedDraw(0.0))
+
+
+@pytest.mark.parametrize('months', [None, 24])
+def test_play_month_with_outcomes_matches_direct(months):
+    for decision in regress.generate_corpus(200, seed=2):
+        if months:
+            decision = dict(decision, months=months, choices=[random.Random(decision['seed']).choice('AB')] * months)
+        base = engine.new_team(decision)
+        engine.settle_pricing(base, decision['price'] or engine.suggested_price(base, 1000, 50))
+        engine.start_survival(base)
+        if months:
+            engine.start_campaign(base, months, random.Random(decision['seed']))
+        direct, cached = copy.deepcopy(base), copy.deepcopy(base)
+        outcomes = engine.outcome_table(cached)
+        rng_a, rng_b = random.Random(decision['seed']), random.Random(decision['seed'])
+        for month, choice in enumerate(decision['choices'][:engine.last_month(base)], start=1):
+            label = engine.option_label(engine.month_event(base, month), choice)
+            if not engine.is_valid_choice(base, engine.month_event(base, month), label):
+                break
+            for team, rng, table in ((direct, rng_a, None), (cached, rng_b, outcomes)):
+                engine.apply_loan_shark(team)
+                engine.play_month(team, month, label, rng, outcomes=table)
+        assert direct == cached
@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+import profiler
+
+
+class FakeStats:
+    def __init__(self, raw):
+        self.stats = raw
+
+
+MAIN, F, G, H = (('app.py', i, name) for i, name in enumerate(['main', 'f', 'g', 'h'], start=1))
+
+
+def edge(ct):
+    return (1, 1, ct, ct)
+
+
+def test_collapsed_stacks_splits_shared_callee_by_edge_time():
+    # main -> f -> h, main -> g -> h；h 的 0.4 秒一半來自 f、一半來自 g
+    stats = FakeStats({
+        MAIN: (1, 1, 0.1, 1.0, {}),
+        F: (1, 1, 0.3, 0.5, {MAIN: edge(0.5)}),
+        G: (1, 1, 0.2, 0.4, {MAIN: edge(0.4)}),
+        H: (2, 2, 0.4, 0.4, {F: edge(0.2), G: edge(0.2)}),
+    })
+    out = profiler.collapsed_stacks(stats, prefix='s3')
+    expected = {'s3;main (app.py:1)': 0.1, 's3;main (app.py:1);f (app.py:2)': 0.3,
+                's3;main (app.py:1);f (app.py:2);h (app.py:4)': 0.2,
+                's3;main (app.py:1);g (app.py:3)': 0.2, 's3;main (app.py:1);g (app.py:3);h (app.py:4)': 0.2}
+    assert out.keys() == expected.keys()
+    for stack, seconds in expected.items():
+        assert out[stack] == pytest.approx(seconds * 1e6)
+    assert sum(out.values()) == pytest.approx(1e6)
+
+
+def test_collapsed_stacks_folds_small_branches_into_parent():
+    stats = FakeStats({
+        MAIN: (1, 1, 0.0, 1.0, {}),
+        F: (1, 1, 0.9995, 0.9995, {MAIN: edge(0.9995)}),
+        G: (1, 1, 0.0005, 0.0005, {MAIN: edge(0.0005)}),
+    })
+    out = profiler.collapsed_stacks(stats, min_fraction=0.001)
+    assert not any('g (app.py:3)' in stack for stack in out)
+    assert sum(out.values()) == pytest.approx(1e6)
+
+
+def test_lock_released_when_profiled_thread_dies(monkeypatch):
+    monkeypatch.setattr(profiler, '_save', lambda run: None)
+    # 側錄中的 rerun 因例外結束，沒有呼叫 end_rerun()
+    worker = threading.Thread(target=profiler.start_rerun, args=('dead', True))
+    worker.start()
+    worker.join()
+    assert profiler._active['run'] is not None
+    profiler.start_rerun('other', requested=True)
+    try:
+        assert profiler._active['run'].session == 'other'
+    finally:
+        profiler.end_rerun()
+    assert profiler._active['run'] is None
@@ -0,0 +1,53 @@
+import re
+
+import classview
+import engine
+import records
+import report_export
+
+
+def summary(team, net_assets, finished=True, choices=(), debt=0):
+    return {'team': team, 'file': f"{team}.html", 'style': 'A', 'finished': finished,
+            'net_assets': net_assets, 'debt': debt, 'choices': list(choices)}
+
+
+def test_render_summary_counts_finished_teams():
+    page = report_export.render_summary([
+        summary('甲', 120000, choices=[(1, 'A'), (2, 'B'), (3, 'A')]),
+        summary('乙', -5000, debt=30000, choices=[(1, 'B'), (2, 'B'), (3, 'C')]),
+        summary('丙', 80000, choices=[(1, 'A')]),
+        summary('丁', 0, finished=False),
+    ])
+    assert '隊伍數：4　完賽：3　破產率 (淨資產 ≤ 0)：33%　淨資產中位數：$80,000' in page
+    rows = dict(re.findall(r'<tr><td class="text">([^<]+)</td>((?:<td>\d+</td>){3})</tr>', page))
+    assert rows[engine.MONTH_EVENTS[1]['title']] == '<td>2</td><td>1</td><td>0</td>'
+    assert rows[engine.MONTH_EVENTS[2]['title']] == '<td>0</td><td>2</td><td>0</td>'
+    # 隊伍依淨資產排序，未完賽排在最後
+    assert re.findall(r'\.html">([^<]+)</a>', page) == ['甲', '丙', '乙', '丁']
+    assert '<td>-$5,000</td><td>$30,000</td>' in page
+
+
+def test_export_reports_reads_saved_records(tmp_path):
+    rec, out = tmp_path / 'records', tmp_path / 'reports'
+    team = engine.play_game({'style': 'B', 'bean': '普通商用豆', 'milk': '燕麥奶', 'choices': ['B', 'B', 'B'], 'seed': 1})
+    records.save_team_record('一隊', 'session-1', team, rec)
+    records.save_team_record('二隊', 'session-2', team, rec)
+    # 重新開始的隊伍刪掉舊紀錄，不會在總結裡重複出現
+    records.delete_team_record('二隊', 'session-2', rec)
+    summaries = report_export.export_reports(rec, out, workers=1)
+    assert [s['team'] for s in summaries] == ['一隊']
+    assert summaries[0]['net_assets'] == team['capital'] - team['debt']
+    assert (out / 'index.html').exists() and (out / summaries[0]['file']).exists()
+
+
+def test_class_chart_drops_deleted_records(tmp_path):
+    team = engine.play_game({'style': 'B', 'bean': '普通商用豆', 'milk': '燕麥奶', 'choices': ['B', 'B', 'B'], 'seed': 1})
+    store = classview.HistoryStore()
+    for i, name in enumerate(['一隊', '二隊', '三隊']):
+        records.save_team_record(name, f"session-{i}", team, tmp_path)
+    store.refresh(tmp_path)
+    records.delete_team_record('一隊', 'session-0', tmp_path)
+    assert store.refresh(tmp_path) == 1
+    capital, style, names = store.columns()
+    assert sorted(names) == ['三隊', '二隊'] and capital.shape[0] == 2 and (style >= 0).all()
+    assert {store.names[r] for r in store.rows.values()} == {'二隊', '三隊'}
@@ -0,0 +1,39 @@
+import hashlib
+import json
+
+import pytest
+
+import regress
+import rulesets
+
+
+# 舊版規則已凍結：這些值不應該因為改 engine.py 而改變
+def test_v1141101_replay_is_unchanged():
+    results, _ = regress.replay(rulesets.get_ruleset('v1141101'), regress.generate_corpus(5000))
+    assert results[1] == {'ai_sales': 524, 'final_capital': -158297, 'debt': 30000, 'net_assets': -188297,
+                          'profits': [-5804, -5804, -50591, -161902],
+                          'events': ['M0 開局 (媽媽贊助)', 'A. 佛心凍漲', 'B. 品牌固樁', 'A. 買二手應急 (💥賭輸爆炸!)']}
+    assert regress.outcome_stats(results) == {'errors': 0, 'bankrupt_rate': 0.3722, 'median_net_assets': 132389.5}
+    digest = hashlib.md5(json.dumps(results, ensure_ascii=False).encode()).hexdigest()
+    assert digest == '3c3e03553ca1cab8ea40062c38f24b99'
+
+
+def test_v1141101_rejects_campaigns():
+    with pytest.raises(ValueError):
+        rulesets.get_ruleset('v1141101').play({'style': 'A', 'bean': '普通商用豆', 'milk': '燕麥奶',
+                                               'months': 12, 'choices': ['A'] * 12})
+
+
+def test_v1141101_demand_variant_takes_effect():
+    corpus = regress.generate_corpus(200)
+    base, _ = regress.replay(rulesets.get_ruleset('v1141101'), corpus)
+    steep, _ = regress.replay(rulesets.variant('steep', 'v1141101', {'demand': {'price_slope': 30}}), corpus)
+    assert regress.compare(base, steep)['differing_games'] > 0
+
+
+def test_regress_compares_a_version_with_itself(tmp_path, capsys):
+    out = tmp_path / 'report.json'
+    assert regress.main(['current', 'current', '--generate', '50', '--output', str(out)]) == 0
+    assert '0 / 50 局結果不同' in capsys.readouterr().out
+    report = json.loads(out.read_text(encoding='utf-8'))
+    assert report['versions'] == ['current', 'current'] and report['stats'][0] == report['stats'][1]
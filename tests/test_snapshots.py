@@ -0,0 +1,70 @@
+import copy
+import random
+
+import engine
+import regress
+import snapshots
+
+
+def steps(decision):
+    """照畫面的順序，每一步是一個會修改 team 的函式 (與 costgame 的 checkpoint 位置相同)"""
+    def s1(team):
+        team.update({'style': decision['style'], 'bean': decision['bean'], 'milk': decision['milk'],
+                     'direct_cost': engine.direct_cost(decision['bean'], decision['milk'])})
+
+    def s2(team):
+        setup = engine.new_team(decision)
+        team.update({'estimated_indirect': setup['estimated_indirect'],
+                     'total_indirect_cost': setup['total_indirect_cost']})
+
+    def s3_suggest(team):
+        team.update({'sales_forecast': decision['sales_forecast'], 'profit_margin': decision['margin'],
+                     'suggested_price': engine.suggested_price(team, decision['sales_forecast'], decision['margin'])})
+
+    def s3_price(team):
+        engine.settle_pricing(team, decision['price'] or team['suggested_price'])
+
+    def month(n, choice):
+        def play(team):
+            engine.apply_loan_shark(team)
+            engine.play_month(team, n, engine.option_label(n, choice), random.Random(n))
+        return play
+
+    return [s1, s2, s3_suggest, s3_price, engine.start_survival] + [
+        month(n, c) for n, c in enumerate(decision['choices'], start=1)]
+
+
+def test_restore_matches_deep_copies():
+    for decision in regress.generate_corpus(500, seed=3):
+        team, head, copies = {}, None, []
+        for stage, step in enumerate(steps(decision)):
+            head = snapshots.take(head, team, f"step {stage}", stage)
+            copies.append((head, copy.deepcopy(team), stage))
+            step(team)
+        for snap, expected, stage in copies:
+            restored, restored_stage = snapshots.restore(snap)
+            assert restored == expected
+            assert restored_stage == stage
+
+
+def test_restored_team_can_be_replayed_without_touching_snapshots():
+    decision = regress.generate_corpus(1, seed=4)[0]
+    team, head = {}, None
+    for stage, step in enumerate(steps(decision)):
+        head = snapshots.take(head, team, f"step {stage}", stage)
+        step(team)
+    # 回到進入生存戰之前重玩一次
+    target = next(s for s in snapshots.chain(head) if s.stage == 4)
+    before = copy.deepcopy(snapshots.restore(target)[0])
+    replay, _ = snapshots.restore(target)
+    for step in steps(decision)[4:]:
+        step(replay)
+    assert replay == team
+    assert snapshots.restore(target)[0] == before
+
+
+def test_removed_fields_are_dropped():
+    head = snapshots.take(None, {'a': 1, 'b': 2}, 'first', 1)
+    head = snapshots.take(head, {'a': 1}, 'second', 2)
+    assert snapshots.restore(head) == ({'a': 1}, 2)
+    assert [s.label for s in snapshots.chain(head)] == ['first', 'second']
@@ -0,0 +1,22 @@
+import state_backend
+
+
+def test_save_team_rejects_stale_revision(tmp_path):
+    db = tmp_path / 'state.db'
+    rev = state_backend.save_team('tok', 'cafe', 1, {'a': 1}, rev=0, path=db)
+    assert rev == 1
+    # 另一個分頁以舊版本送出：不寫入
+    assert state_backend.save_team('tok', 'cafe', 2, {'a': 2}, rev=0, path=db) is None
+    assert state_backend.load_team('tok', path=db)['data'] == {'a': 1}
+    assert state_backend.save_team('tok', 'cafe', 2, {'a': 2}, rev=1, path=db) == 2
+    assert state_backend.load_team('tok', path=db) == {'name': 'cafe', 'stage': 2, 'data': {'a': 2}, 'rev': 2}
+
+
+def test_purge_removes_only_old_entries(tmp_path):
+    db = tmp_path / 'state.db'
+    state_backend.put_pickle('prefetch', 'old', [1], path=db)
+    state_backend.connect(db).execute('UPDATE kv SET updated = 0')
+    state_backend.put_pickle('prefetch', 'new', [2], path=db)
+    assert state_backend.purge('prefetch', 3600, path=db) == 1
+    assert state_backend.get_pickle('prefetch', 'old', path=db) is None
+    assert state_backend.get_pickle('prefetch', 'new', path=db) == [2]